@@ -2,12 +2,17 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
 import sqlite3
-import random
-import string
+import secrets
 from datetime import datetime, timedelta
 from decimal import Decimal
 import json
 
+from sqlalchemy.dialects.sqlite import dialect as sqlite_dialect
+from sqlalchemy.schema import CreateIndex
+
+from models import Base
+from trade_codes import encode_trade_code
+
 app = Flask(__name__)
 CORS(app)
 
@@ -87,6 +92,16 @@ def init_db():
         )
     ''')
     
+    # Indexes are declared once on the ORM models. Unique ones are skipped because
+    # these tables never enforced uniqueness, and so are redundant primary-key ones.
+    # Tables only the FastAPI backend uses (idempotency keys) are not created here
+    for table in Base.metadata.sorted_tables:
+        if table.name not in ("users", "listings", "deals", "logs"):
+            continue
+        for index in table.indexes:
+            if not index.unique and not all(column.primary_key for column in index.columns):
+                cursor.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=sqlite_dialect())))
+    
     # Create admin user if not exists
     cursor.execute('SELECT id FROM users WHERE telegram_id = ?', (ADMIN_ID,))
     if not cursor.fetchone():
@@ -98,9 +113,6 @@ def init_db():
     conn.commit()
     conn.close()
 
-def generate_trade_code():
-    return "#" + "".join(random.choices(string.ascii_uppercase + string.digits, k=5))
-
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
@@ -205,7 +217,6 @@ def create_listing():
 @app.route('/deals', methods=['POST'])
 def create_deal():
     data = request.json
-    trade_code = generate_trade_code()
     expires_at = datetime.now() + timedelta(minutes=90)
     commission = float(data['usdt_amount']) * (COMMISSION_PERCENT / 100)
     
@@ -216,11 +227,14 @@ def create_deal():
         INSERT INTO deals (listing_id, buyer_id, seller_id, trade_code, usdt_amount, etb_amount, 
                           payment_method, escrow_wallet, commission_amount, expires_at)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (data['listing_id'], data['buyer_id'], data['seller_id'], trade_code,
+    ''', (data['listing_id'], data['buyer_id'], data['seller_id'], '~' + secrets.token_hex(9),
           data['usdt_amount'], data['etb_amount'], data['payment_method'],
           ESCROW_WALLET, commission, expires_at))
     
+    # Trade code is derived from the new row id, so it can never collide
     deal_id = cursor.lastrowid
+    trade_code = encode_trade_code(deal_id)
+    cursor.execute('UPDATE deals SET trade_code = ? WHERE id = ?', (trade_code, deal_id))
     
     # Log deal creation
     cursor.execute('''
@@ -307,15 +321,24 @@ def confirm_payment():
     conn = sqlite3.connect('p2p_trading.db')
     cursor = conn.cursor()
     
-    cursor.execute('UPDATE deals SET status = ? WHERE trade_code = ?', ('paid', trade_code))
+    # Guarded transition: the status check and the write are one statement
+    cursor.execute('''
+        UPDATE deals SET status = 'paid', updated_at = CURRENT_TIMESTAMP
+        WHERE trade_code = ? AND status IN ('pending', 'escrowed')
+        RETURNING id
+    ''', (trade_code,))
+    row = cursor.fetchone()
     
-    if cursor.rowcount == 0:
+    if not row:
+        cursor.execute('SELECT 1 FROM deals WHERE trade_code = ?', (trade_code,))
+        found = cursor.fetchone()
         conn.close()
-        return jsonify({"success": False, "message": "Deal not found"}), 404
+        if not found:
+            return jsonify({"success": False, "message": "Deal not found"}), 404
+        return jsonify({"success": False, "message": "Deal cannot be confirmed in current status"}), 400
     
-    # Log payment confirmation
-    cursor.execute('SELECT id FROM deals WHERE trade_code = ?', (trade_code,))
-    deal_id = cursor.fetchone()[0]
+    # Log payment confirmation in the same transaction
+    deal_id = row[0]
     
     cursor.execute('''
         INSERT INTO logs (deal_id, action, notes)
@@ -343,21 +366,25 @@ def release_funds():
     conn = sqlite3.connect('p2p_trading.db')
     cursor = conn.cursor()
     
-    cursor.execute('SELECT usdt_amount, commission_amount FROM deals WHERE trade_code = ?', (trade_code,))
+    # Guarded transition: only one of concurrent releases can match status = 'paid'
+    cursor.execute('''
+        UPDATE deals SET status = 'completed', updated_at = CURRENT_TIMESTAMP
+        WHERE trade_code = ? AND status = 'paid'
+        RETURNING id, usdt_amount, commission_amount
+    ''', (trade_code,))
     result = cursor.fetchone()
     
     if not result:
+        cursor.execute('SELECT 1 FROM deals WHERE trade_code = ?', (trade_code,))
+        found = cursor.fetchone()
         conn.close()
-        return jsonify({"success": False, "message": "Deal not found"}), 404
-    
-    usdt_amount, commission = result
-    
-    cursor.execute('UPDATE deals SET status = ? WHERE trade_code = ?', ('completed', trade_code))
+        if not found:
+            return jsonify({"success": False, "message": "Deal not found"}), 404
+        return jsonify({"success": False, "message": "Deal must be in 'paid' status to release funds"}), 400
     
-    # Log fund release
-    cursor.execute('SELECT id FROM deals WHERE trade_code = ?', (trade_code,))
-    deal_id = cursor.fetchone()[0]
+    deal_id, usdt_amount, commission = result
     
+    # Log fund release in the same transaction
     cursor.execute('''
         INSERT INTO logs (deal_id, action, notes)
         VALUES (?, ?, ?)
@@ -0,0 +1,117 @@
+"""
+Buffered audit log pipeline with group commits
+
+Audit rows are attached to the request's session and handed to the pipeline
+only when that session commits, so a rolled-back business change never leaves
+an audit row behind. Queued rows are written in batches by a background task,
+either when the batch fills up or after a short time window. Actions listed in
+AUDIT_SYNC_ACTIONS (or every action with AUDIT_DURABILITY=sync) are instead
+added to the business transaction itself and committed with it.
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from models import Log
+
+logger = logging.getLogger(__name__)
+
+AUDIT_DURABILITY = os.getenv("AUDIT_DURABILITY", "buffered")  # buffered, sync
+AUDIT_SYNC_ACTIONS = {
+    action.strip()
+    for action in os.getenv("AUDIT_SYNC_ACTIONS", "payment_confirmed,funds_released").split(",")
+    if action.strip()
+}
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "100"))
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "200"))
+
+class AuditLog:
+    """In-memory queue of Log rows flushed in batched transactions"""
+
+    def __init__(self, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_interval: float = AUDIT_FLUSH_INTERVAL_MS / 1000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = deque()
+        self.session_factory = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def is_durable(self, action: str) -> bool:
+        """Whether an action must be committed together with the business change"""
+        return AUDIT_DURABILITY == "sync" or action in AUDIT_SYNC_ACTIONS
+
+    def record(self, db, entry: dict):
+        """Add an audit row to the session, or stage it until the session commits"""
+        if self.is_durable(entry["action"]) or self._task is None:
+            db.add(Log(**entry))
+        else:
+            db.sync_session.info.setdefault("audit", []).append(entry)
+
+    def enqueue(self, entries):
+        self.pending.extend(entries)
+        if len(self.pending) >= self.batch_size and self._wakeup:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Write every queued row, one transaction per batch"""
+        while self.pending:
+            batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+            try:
+                async with self.session_factory() as db:
+                    await db.execute(insert(Log), batch)
+                    await db.commit()
+            except BaseException as e:
+                # Requeue on cancellation too, so the batch is written by the final flush
+                self.pending.extendleft(reversed(batch))
+                if not isinstance(e, Exception):
+                    raise
+                logger.exception("Audit flush failed, %d rows requeued", len(batch))
+                return
+
+    async def run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self, session_factory):
+        """Start the background flusher on the running event loop"""
+        self.session_factory = session_factory
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the flusher and write whatever is still queued"""
+        if self._task:
+            # Let the loop finish its in-flight flush and exit; cancelling it
+            # mid-transaction would drop the batch and could leave the write lock held
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+# Process-wide audit pipeline
+audit_log = AuditLog()
+
+@event.listens_for(Session, "after_commit")
+def _queue_committed_audit(session):
+    entries = session.info.pop("audit", None)
+    if entries:
+        audit_log.enqueue(entries)
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back_audit(session):
+    session.info.pop("audit", None)
@@ -0,0 +1,122 @@
+"""
+End-to-end check of MATCHING_MODE=auto through the API
+
+Usage (from backend/): python benchmarks/auto_matching.py [--listings 300] [--seed 1]
+
+Boots the app on a throwaway database with auto matching on and posts a
+seeded stream of buy and sell listings (one user each, rates around a mid,
+some per-deal max_amount limits, no minimums, so any crossing pair can
+trade). Every deal a listing creates must read back with GET
+/deals/{trade_code}, including deals against listings they completed, and
+afterwards no payment method may be left with a crossed book (a negative
+spread in GET /market/summary). The same must hold after a crossing pair is
+posted through POST /listings/bulk and after a resting listing is repriced
+through the book with PUT /listings/{id}. Exits non-zero on any failure.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+# Run against a throwaway database and archive directory, never the real ones
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ["LOG_ARCHIVE_DIR"] = tempfile.mkdtemp()
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["MATCHING_MODE"] = "auto"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+PAYMENT_METHODS = ["Telebirr", "CBE Birr"]
+MID_RATE = Decimal("120.00")
+TICK = Decimal("0.25")
+
+def listing_stream(n, seed):
+    rng = random.Random(seed)
+    for user_id in range(1, n + 1):
+        max_amount = rng.choice((None, None, 20, 50))
+        yield {
+            "user_id": user_id, "type": rng.choice(("buy", "sell")),
+            "amount": str(rng.randint(5, 100)), "rate": str(MID_RATE + TICK * rng.randint(-8, 8)),
+            "payment_method": rng.choice(PAYMENT_METHODS), "contact": f"@user{user_id}",
+            "max_amount": str(max_amount) if max_amount else None,
+        }
+
+async def crossed_markets(client):
+    summary = (await client.get("/market/summary")).json()["data"]
+    return [m for m in summary if m["spread"] is not None and Decimal(m["spread"]) < 0]
+
+async def read_deals(client, deals, failures):
+    for deal in deals:
+        code = deal["trade_code"].replace("#", "%23")
+        read = await client.get(f"/deals/{code}")
+        if read.status_code != 200:
+            failures.append(f"GET /deals/{deal['trade_code']}: {read.status_code}")
+
+async def main(args):
+    import main
+
+    failures = []
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://matching", timeout=60) as client:
+        await main.startup_event()
+        try:
+            for user_id in range(1, args.listings + 1):
+                await client.post("/users", json={"name": f"user{user_id}", "telegram_id": str(user_id)})
+            start = time.perf_counter()
+            deals = 0
+            for listing in listing_stream(args.listings, args.seed):
+                response = await client.post("/listings", json=listing)
+                if response.status_code != 200:
+                    failures.append(f"POST /listings: {response.status_code} {response.text[:200]}")
+                    continue
+                matched = response.json()["data"].get("deals", [])
+                deals += len(matched)
+                await read_deals(client, matched, failures)
+            elapsed = time.perf_counter() - start
+            for market in await crossed_markets(client):
+                failures.append(f"crossed book after single posts: {market}")
+
+            # A crossing pair in one bulk request trades like two single posts
+            pair = [
+                {"user_id": 1, "type": "sell", "amount": "10", "rate": "100", "payment_method": "CBE", "contact": "@user1"},
+                {"user_id": 2, "type": "buy", "amount": "10", "rate": "110", "payment_method": "CBE", "contact": "@user2"},
+            ]
+            response = await client.post("/listings/bulk", json=pair)
+            if response.status_code != 200 or response.json()["created"] != 2:
+                failures.append(f"POST /listings/bulk: {response.status_code} {response.text[:200]}")
+            for market in await crossed_markets(client):
+                failures.append(f"crossed book after bulk post: {market}")
+
+            # Repricing a resting buy above the best sell trades it
+            sell = (await client.post("/listings", json={**pair[0], "user_id": 3, "rate": "130"})).json()["data"]
+            buy = (await client.post("/listings", json={**pair[1], "user_id": 4, "rate": "125"})).json()["data"]
+            if sell.get("deals") or buy.get("deals"):
+                failures.append("non-crossing CBE listings traded")
+            response = await client.put(f"/listings/{buy['listing_id']}", json={"rate": "130"})
+            matched = (response.json().get("data") or {}).get("deals", []) if response.status_code == 200 else []
+            if len(matched) != 1:
+                failures.append(f"PUT /listings/{buy['listing_id']} repriced through the book: {response.text[:200]}")
+            deals += len(matched)
+            await read_deals(client, matched, failures)
+            for market in await crossed_markets(client):
+                failures.append(f"crossed book after reprice: {market}")
+        finally:
+            await main.shutdown_event()
+
+    print(f"{args.listings} listings, {deals} deals in {elapsed:.2f}s")
+    for failure in failures[:20]:
+        print("  " + failure)
+    print("auto matching consistent" if not failures else f"{len(failures)} failures")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--listings", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
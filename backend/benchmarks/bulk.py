@@ -0,0 +1,60 @@
+"""
+Bulk ingestion benchmark: POST /listings/bulk and /users/bulk vs the single-item endpoints
+
+Usage (from backend/): python benchmarks/bulk.py [--items 500] [--batch 100]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Run against a throwaway database, never the real one
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ["LOG_ARCHIVE_DIR"] = tempfile.mkdtemp()
+# One client address drives every request; measure the app, not the rate limiter
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import main
+
+def user(prefix, i):
+    return {"name": f"{prefix}{i}", "telegram_username": f"{prefix}{i}", "telegram_id": f"{prefix}{i}"}
+
+def listing(i):
+    return {"user_id": 1, "type": "buy" if i % 2 else "sell", "amount": "500",
+            "rate": str(118 + i % 7), "payment_method": "Telebirr", "contact": "@maker"}
+
+async def timed(label, items, coro):
+    start = time.perf_counter()
+    await coro
+    elapsed = time.perf_counter() - start
+    print(f"{label:>22}: {items / elapsed:9.0f} items/s  ({elapsed * 1000:8.1f}ms for {items})")
+
+async def singles(client, path, payloads):
+    for payload in payloads:
+        await client.post(path, json=payload)
+
+async def batches(client, path, payloads, size):
+    for i in range(0, len(payloads), size):
+        await client.post(path, json=payloads[i:i + size])
+
+async def main_async(args):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await main.startup_event()
+        n = args.items
+        await timed("POST /users", n, singles(client, "/users", [user("s", i) for i in range(n)]))
+        await timed("POST /users/bulk", n, batches(client, "/users/bulk", [user("b", i) for i in range(n)], args.batch))
+        await timed("POST /listings", n, singles(client, "/listings", [listing(i) for i in range(n)]))
+        await timed("POST /listings/bulk", n, batches(client, "/listings/bulk", [listing(i) for i in range(n)], args.batch))
+        await main.shutdown_event()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=100)
+    asyncio.run(main_async(parser.parse_args()))
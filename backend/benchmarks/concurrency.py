@@ -0,0 +1,81 @@
+"""
+Concurrency benchmark: GET /listings latency with and without parallel POST /deals traffic
+
+Usage (from backend/): python benchmarks/concurrency.py [--readers 20] [--writers 10] [--seconds 5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Run against a throwaway database, never the real one
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ["LOG_ARCHIVE_DIR"] = tempfile.mkdtemp()
+# One client address drives every request; measure the app, not the rate limiter
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import main
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def seed(client, listings=200):
+    """Create two users and a page worth of active listings"""
+    for name in ("seller", "buyer"):
+        await client.post("/users", json={"name": name, "telegram_username": name, "telegram_id": name})
+    for i in range(listings):
+        await client.post("/listings", json={
+            "user_id": 1, "type": "sell", "amount": "1000", "rate": str(120 + i % 10),
+            "payment_method": "Telebirr", "contact": "@seller"
+        })
+
+async def reader(client, deadline, samples):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await client.get("/listings")
+        samples.append((time.perf_counter() - start) * 1000)
+
+async def writer(client, deadline, counter):
+    while time.perf_counter() < deadline:
+        await client.post("/deals", json={
+            "listing_id": 1, "buyer_id": 2, "seller_id": 1,
+            "usdt_amount": "1", "etb_amount": "120", "payment_method": "Telebirr"
+        })
+        counter[0] += 1
+
+async def run_phase(client, readers, writers, seconds):
+    samples, counter = [], [0]
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(
+        *(reader(client, deadline, samples) for _ in range(readers)),
+        *(writer(client, deadline, counter) for _ in range(writers))
+    )
+    return samples, counter[0]
+
+async def main_async(args):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await main.startup_event()
+        await seed(client)
+        for label, writers in (("reads only", 0), ("reads + deals", args.writers)):
+            samples, writes = await run_phase(client, args.readers, writers, args.seconds)
+            print(f"{label:>14}: {len(samples):6d} GET /listings  "
+                  f"p50={percentile(samples, 50):7.2f}ms  p99={percentile(samples, 99):7.2f}ms  "
+                  f"POST /deals={writes}")
+        await main.shutdown_event()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--writers", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=5)
+    asyncio.run(main_async(parser.parse_args()))
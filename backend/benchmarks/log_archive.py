@@ -0,0 +1,132 @@
+"""
+Log archival benchmark: archive size, sweep time and archived-row lookups
+
+Usage (from backend/): python benchmarks/log_archive.py [--rows 200000] [--days 180] [--retention 30]
+
+Fills a throwaway database with --rows audit rows spread evenly over the last
+--days days (realistic actions, IPs and browser user agents), then runs one
+archival sweep with the given retention. Reports the rows moved, the sweep
+time, the compressed archive size against the bytes the rows took in the
+database, and the latency of deal lookups and time-range queries that hit
+live rows, archived rows and both. Exits non-zero if any lookup returns
+different rows than it did before the sweep.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Run against a throwaway database and archive directory, never the real ones
+workdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+os.environ["LOG_ARCHIVE_DIR"] = os.path.join(workdir, "log_archive")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select, func, text
+
+from database import AsyncSessionLocal, async_engine, create_tables
+from log_archive import LogArchive
+from models import Log
+
+ACTIONS = ["listing_created", "listing_updated", "deal_created", "payment_confirmed",
+           "funds_released", "deal_expired", "user_created"]
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/17.4 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/123.0.6312.99 Mobile Safari/537.36",
+    "python-telegram-bot/20.7",
+]
+
+async def fill(args, now):
+    rng = random.Random(args.seed)
+    step = timedelta(days=args.days) / args.rows
+    deals = max(1, args.rows // 6)
+    for start in range(0, args.rows, 10_000):
+        batch = []
+        for i in range(start, min(start + 10_000, args.rows)):
+            deal_id = i * deals // args.rows + 1  # deals progress through time
+            batch.append({
+                "deal_id": deal_id, "user_id": rng.randint(1, 5_000), "action": rng.choice(ACTIONS),
+                "notes": f"Deal #EZ{deal_id:05d} for {rng.randint(10, 5_000)} USDT",
+                "ip_address": f"196.188.{rng.randint(0, 255)}.{rng.randint(0, 255)}",
+                "user_agent": rng.choice(USER_AGENTS), "timestamp": now - args.days * timedelta(days=1) + i * step,
+            })
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(Log), batch)
+            await db.commit()
+    return deals
+
+async def table_bytes(db) -> int:
+    try:
+        return await db.scalar(text("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE '%logs%'"))
+    except Exception:
+        return 0  # SQLite built without the dbstat table
+
+async def lookups(archive, deals, now, args):
+    """(label, rows, ms) for a fixed set of queries"""
+    old_deal, new_deal = 1, deals
+    queries = [
+        ("deal, archived", dict(deal_id=old_deal)),
+        ("deal, live", dict(deal_id=new_deal)),
+        ("1 day, archived", dict(since=now - timedelta(days=args.days - 10), until=now - timedelta(days=args.days - 11))),
+        ("1 day, live", dict(since=now - timedelta(days=2), until=now - timedelta(days=1))),
+        ("around cutoff", dict(since=now - timedelta(days=args.retention + 1),
+                               until=now - timedelta(days=args.retention - 1))),
+    ]
+    results = []
+    async with AsyncSessionLocal() as db:
+        for label, filters in queries:
+            start = time.perf_counter()
+            rows = await archive.query(db, limit=100_000, **filters)
+            results.append((label, rows, (time.perf_counter() - start) * 1000))
+    return results
+
+async def main(args):
+    await create_tables()
+    now = datetime.utcnow()
+    deals = await fill(args, now)
+    archive = LogArchive(retention_days=args.retention, max_live_rows=0)
+    archive.session_factory = AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        before_bytes = await table_bytes(db)
+    before = await lookups(archive, deals, now, args)
+
+    start = time.perf_counter()
+    moved = await archive.sweep()
+    elapsed = time.perf_counter() - start
+    async with AsyncSessionLocal() as db:
+        live = await db.scalar(select(func.count(Log.id)))
+        after_bytes = await table_bytes(db)
+    metrics = archive.metrics()
+    print(f"{args.rows} rows over {args.days} days, retention {args.retention} days")
+    print(f"archived {moved} rows in {elapsed:.2f}s ({moved / elapsed:,.0f} rows/s), {live} left live")
+    print(f"{len(metrics['partitions'])} partitions, {metrics['archived_bytes'] / 1e6:.1f} MB compressed")
+    if before_bytes:
+        print(f"logs table + indexes: {before_bytes / 1e6:.1f} MB before, "
+              f"{after_bytes / 1e6:.1f} MB of live pages after")
+
+    failures = 0
+    print(f"{'query':>16} {'rows':>6} {'before ms':>10} {'after ms':>9}")
+    for (label, rows, before_ms), (_, rows_after, after_ms) in zip(before, await lookups(archive, deals, now, args)):
+        same = [(row["id"], row["timestamp"]) for row in rows] == [(row["id"], row["timestamp"]) for row in rows_after]
+        failures += not same
+        print(f"{label:>16} {len(rows):>6} {before_ms:10.2f} {after_ms:9.2f}{'' if same else '  MISMATCH'}")
+    await async_engine.dispose()
+    print("lookups unchanged by archival" if not failures else f"{failures} lookups changed")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--retention", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,157 @@
+"""
+Matching engine benchmark and deterministic replay check
+
+Usage (from backend/): python benchmarks/matching.py [--orders 100000] [--seed 1] [--replay]
+
+Generates a seeded stream of buy and sell listings around a mid rate and
+submits them to the engine, reporting orders/second and the time per order
+against books of increasing depth. --replay instead runs a stream twice
+through fresh engines and once through a brute-force reference matcher (a
+sorted scan over every resting order, same rules) and checks that all three
+produce the identical fill sequence; it exits non-zero otherwise.
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matching import MatchingEngine, Order, Fill, fill_size, ETB_QUANTUM
+
+PAYMENT_METHODS = ["Telebirr", "CBE Birr", "Awash Bank", "M-Pesa"]
+MID_RATE = Decimal("120.00")
+TICK = Decimal("0.25")
+
+def order_stream(n, seed, users=200, first_id=1, spread=20):
+    """Seeded listing specs: (id, side, user, rate, amount, method, min, max)"""
+    rng = random.Random(seed)
+    specs = []
+    for i in range(first_id, first_id + n):
+        side = rng.choice(("buy", "sell"))
+        rate = MID_RATE + TICK * rng.randint(-spread, spread)
+        amount = Decimal(rng.randint(10, 500))
+        min_amount = Decimal(rng.choice((0, 0, 10, 50))) or None
+        max_amount = Decimal(rng.choice((0, 0, 100, 250))) or None
+        specs.append((i, side, rng.randint(1, users), rate, amount,
+                      rng.choice(PAYMENT_METHODS), min_amount, max_amount))
+    return specs
+
+def build(spec) -> Order:
+    order_id, side, user, rate, amount, method, min_amount, max_amount = spec
+    return Order(order_id, side, user, rate, amount, method, min_amount, max_amount)
+
+def digest(fills) -> str:
+    return hashlib.sha256(repr(fills).encode()).hexdigest()[:16]
+
+def run_engine(specs, scan_limit):
+    engine = MatchingEngine(scan_limit)
+    fills = []
+    for spec in specs:
+        fills.extend(engine.match(build(spec)))
+    return fills
+
+def run_reference(specs, scan_limit):
+    """The same rules by brute force: sort every crossing resting order, scan in order"""
+    resting = {}
+    fills = []
+    for spec in specs:
+        taker = build(spec)
+        opposite = "sell" if taker.side == "buy" else "buy"
+        candidates = sorted(
+            (o for o in resting.values() if o.market == taker.market and o.side == opposite and
+             (o.rate <= taker.rate if taker.side == "buy" else o.rate >= taker.rate)),
+            key=lambda o: (-o.rate if o.side == "buy" else o.rate, o.id)
+        )
+        remaining = taker.amount
+        skipped = 0
+        for maker in candidates:
+            if not (remaining > 0 and remaining >= taker.min_amount):
+                break
+            traded = False
+            while maker.user_id != taker.user_id and remaining > 0 and remaining >= taker.min_amount:
+                size = fill_size(remaining, maker.amount, taker, maker)
+                if size is None:
+                    break
+                traded = True
+                remaining -= size
+                maker.amount -= size
+                fills.append(Fill(
+                    maker.id, taker.id,
+                    taker.user_id if taker.side == "buy" else maker.user_id,
+                    maker.user_id if taker.side == "buy" else taker.user_id,
+                    maker.rate, size, (size * maker.rate).quantize(ETB_QUANTUM), maker.amount,
+                    maker.payment_method
+                ))
+            if not traded:
+                skipped += 1
+                if skipped > scan_limit:
+                    break
+                continue
+            if not maker.tradeable:
+                del resting[maker.id]
+        taker.amount = remaining
+        if taker.tradeable:
+            resting[taker.id] = taker
+    return fills
+
+def replay(args):
+    specs = order_stream(args.orders, args.seed)
+    first = run_engine(specs, args.scan_limit)
+    second = run_engine(specs, args.scan_limit)
+    reference = run_reference(specs, args.scan_limit)
+    print(f"{len(specs)} orders, {len(first)} fills")
+    print(f"  engine run 1: {digest(first)}")
+    print(f"  engine run 2: {digest(second)}")
+    print(f"  reference:    {digest(reference)}")
+    ok = first == second == reference
+    print("identical fills" if ok else "MISMATCH")
+    sys.exit(0 if ok else 1)
+
+def throughput(args):
+    specs = order_stream(args.orders, args.seed)
+    orders = [build(spec) for spec in specs]
+    engine = MatchingEngine(args.scan_limit)
+    start = time.perf_counter()
+    for order in orders:
+        engine.match(order)
+    elapsed = time.perf_counter() - start
+    print(f"{len(orders)} orders in {elapsed:.2f}s: {len(orders) / elapsed:,.0f} orders/s, "
+          f"{engine.fills} fills, {len(engine.orders)} resting")
+
+    # Per-order cost against ever deeper books: rest non-crossing orders far from
+    # the mid, then time crossing orders that match near it
+    print("depth   us/order")
+    for depth in (1_000, 10_000, 100_000):
+        engine = MatchingEngine(args.scan_limit)
+        rng = random.Random(args.seed)
+        for i in range(depth):
+            side = "buy" if i % 2 else "sell"
+            offset = TICK * rng.randint(100, 400)
+            rate = MID_RATE - offset if side == "buy" else MID_RATE + offset
+            engine.rest(Order(i + 1, side, rng.randint(1, 200), rate, Decimal(100),
+                              rng.choice(PAYMENT_METHODS)))
+        crossing = [build(spec) for spec in order_stream(10_000, args.seed + 1, first_id=depth + 1)]
+        start = time.perf_counter()
+        for order in crossing:
+            engine.match(order)
+        per_order = (time.perf_counter() - start) / len(crossing) * 1e6
+        print(f"{depth:>7} {per_order:8.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scan-limit", type=int, default=64)
+    parser.add_argument("--replay", action="store_true",
+                        help="check determinism against a reference matcher instead of timing")
+    args = parser.parse_args()
+    if args.replay:
+        args.orders = min(args.orders, 5_000)  # the reference matcher is quadratic
+        replay(args)
+    else:
+        throughput(args)
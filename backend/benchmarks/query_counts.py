@@ -0,0 +1,117 @@
+"""
+Query-count check: read endpoints run a fixed number of SQL statements per page
+
+Usage (from backend/): python benchmarks/query_counts.py [--rows 60]
+
+Seeds a throwaway database with --rows users, active and inactive listings
+and paid deals, then counts the statements each read endpoint executes
+(a before_cursor_execute listener on the API engines) at a page size of 1
+and of --rows. Relationship loads must come from the main SELECT, so the
+count is the same at both sizes and equals the expected number below; any
+other count, such as a lazy load per row, exits non-zero.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Run against a throwaway database and archive directory, never the real ones
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ["LOG_ARCHIVE_DIR"] = tempfile.mkdtemp()
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["RELEASE_SECRET"] = "counts"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import event
+
+# (label, path with {limit}, expected statements)
+CHECKS = [
+    ("listings, SQL path", "/listings?status=inactive&limit={limit}", 2),
+    ("listings, SQL path, no total", "/listings?status=inactive&limit={limit}&with_total=false", 1),
+    ("listings, order book", "/listings?limit={limit}", 0),
+    ("listing search", "/listings/search?q=Telebirr&limit={limit}", 2),
+    ("pending deals", "/admin/pending-deals?limit={limit}", 2),
+    ("pending deals, no total", "/admin/pending-deals?limit={limit}&with_total=false", 1),
+    ("deal by trade code", "/deals/%23QC0001", 1),
+]
+
+async def seed(rows):
+    from database import AsyncSessionLocal
+    from models import Deal, Listing, User
+
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        db.add_all(User(id=i, name=f"user{i}", telegram_username=f"user{i}", telegram_id=str(i))
+                   for i in range(1, rows + 1))
+        await db.flush()
+        db.add_all(
+            Listing(id=i, user_id=(i - 1) % rows + 1, type="buy" if i % 2 else "sell",
+                    amount=Decimal("100"), rate=Decimal("120") + i % 7, payment_method="Telebirr",
+                    contact="@user", description=f"Listing {i}",
+                    status="active" if i <= rows else "inactive", created_at=now - timedelta(seconds=i))
+            for i in range(1, 2 * rows + 1)
+        )
+        await db.flush()
+        db.add_all(
+            Deal(listing_id=i, buyer_id=i % rows + 1, seller_id=i, usdt_amount=Decimal("10"),
+                 etb_amount=Decimal("1200"), trade_code=f"#QC{i:04d}", escrow_wallet="TXcounts",
+                 status="paid", payment_method="Telebirr", created_at=now - timedelta(seconds=i),
+                 expires_at=now + timedelta(hours=1))
+            for i in range(1, rows + 1)
+        )
+        await db.commit()
+
+async def main(args):
+    import main
+    from database import async_engine, async_read_engine
+
+    await main.init_database()
+    await seed(args.rows)
+    await main.load_order_book()
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    engines = {async_engine.sync_engine, async_read_engine.sync_engine}
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", count)
+
+    failures = 0
+    # A lazy load in async code raises; report it as a 500 rather than aborting
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://counts") as client:
+        print(f"{'endpoint':>30} {'expected':>8} {'limit=1':>8} {f'limit={args.rows}':>9}")
+        for label, path, expected in CHECKS:
+            counts = []
+            for limit in (1, args.rows):
+                main.listings_cache.bump()  # count the query, not the cached page
+                statements.clear()
+                response = await client.get(path.format(limit=limit))
+                if response.status_code != 200:
+                    print(f"{label}: HTTP {response.status_code} {response.text[:200]}")
+                    failures += 1
+                counts.append(len(statements))
+            ok = counts == [expected, expected]
+            failures += not ok
+            print(f"{label:>30} {expected:>8} {counts[0]:>8} {counts[1]:>9}{'' if ok else '  MISMATCH'}")
+            if not ok:
+                for statement in statements:
+                    print("    " + " ".join(statement.split())[:160])
+
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", count)
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+    print("query counts as expected" if not failures else f"{failures} query-count checks failed")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=60)
+    asyncio.run(main(parser.parse_args()))
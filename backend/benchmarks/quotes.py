@@ -0,0 +1,115 @@
+"""
+GET /quote index benchmark: quote latency and update cost at 100k listings
+
+Usage (from backend/): python benchmarks/quotes.py [--listings 100000] [--quotes 2000] [--seed 1]
+
+Fills a QuoteIndex with seeded active listings (rates around a mid, assorted
+amounts and min/max limits, four payment methods), then times quotes for
+small, typical, large and unfillable amounts, with and without a payment
+method, and the cost of the listing writes that keep the index current.
+The first --check quotes of each row are also answered by a brute-force scan
+(filter, then sort by price and id); any difference exits non-zero.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quotes import QuoteIndex, amount_bounds
+
+PAYMENT_METHODS = ["Telebirr", "CBE Birr", "Awash Bank", "M-Pesa"]
+MID_RATE = Decimal("120.00")
+TICK = Decimal("0.25")
+
+def make_listing(listing_id, rng):
+    amount = Decimal(rng.choice((50, 100, 250, 500, 1000, 5000, 20000))) * rng.randint(1, 4)
+    return SimpleNamespace(
+        id=listing_id,
+        type=rng.choice(("buy", "sell")),
+        rate=MID_RATE + TICK * rng.randint(-40, 40),
+        amount=amount,
+        min_amount=Decimal(rng.choice((0, 0, 10, 100, 500))) or None,
+        max_amount=Decimal(rng.choice((0, 0, 200, 1000, 10000))) or None,
+        payment_method=rng.choice(PAYMENT_METHODS),
+    )
+
+def brute_force(listings, side, amount, payment_method, limit):
+    eligible = []
+    for listing in listings.values():
+        if listing.type != side or (payment_method and listing.payment_method != payment_method):
+            continue
+        low, high = amount_bounds(listing)
+        if low <= amount <= high:
+            eligible.append(listing)
+    eligible.sort(key=lambda l: (-l.rate if side == "buy" else l.rate, l.id))
+    return [listing.id for listing in eligible[:limit]]
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+def main(args):
+    rng = random.Random(args.seed)
+    listings = {i: make_listing(i, rng) for i in range(1, args.listings + 1)}
+    index = QuoteIndex()
+    start = time.perf_counter()
+    for listing in listings.values():
+        index.add(listing)
+    print(f"{args.listings} listings indexed in {time.perf_counter() - start:.2f}s")
+
+    failures = 0
+    print(f"{'amount':>8} {'method':>10} {'found':>5} {'p50 us':>8} {'p99 us':>8} {'max us':>8}")
+    for amount in (25.0, 250.0, 4000.0, 60000.0, 1e9):
+        for payment_method in (None, "Telebirr"):
+            timings = []
+            found = 0
+            for i in range(args.quotes):
+                side = "sell" if i % 2 else "buy"
+                t0 = time.perf_counter()
+                ids = index.quote(side, amount, payment_method, args.limit)
+                timings.append((time.perf_counter() - t0) * 1e6)
+                found = len(ids)
+                if i < args.check and ids != brute_force(listings, side, amount, payment_method, args.limit):
+                    failures += 1
+            print(f"{amount:>8g} {payment_method or 'any':>10} {found:>5} "
+                  f"{statistics.median(timings):8.1f} {percentile(timings, 0.99):8.1f} {max(timings):8.1f}")
+
+    # Writes: new and removed listings (an edit is one of each, as in OrderBook.upsert)
+    timings = []
+    next_id = args.listings + 1
+    victims = rng.sample(sorted(listings), args.quotes)
+    for i in range(args.quotes):
+        if i % 2:
+            victim = listings.pop(victims[i])
+            t0 = time.perf_counter()
+            index.discard(victim)
+        else:
+            listing = listings[next_id] = make_listing(next_id, rng)
+            next_id += 1
+            t0 = time.perf_counter()
+            index.add(listing)
+        timings.append((time.perf_counter() - t0) * 1e6)
+    print(f"writes: p50 {statistics.median(timings):.1f}us, p99 {percentile(timings, 0.99):.1f}us")
+    for side in ("buy", "sell"):
+        for amount in (25.0, 250.0, 4000.0):
+            if index.quote(side, amount, None, args.limit) != brute_force(listings, side, amount, None, args.limit):
+                failures += 1
+
+    print("quotes match brute force" if not failures else f"{failures} quotes differ from brute force")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--quotes", type=int, default=2_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--check", type=int, default=4, help="quotes per row checked by brute force")
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,70 @@
+"""
+Rate limiter benchmark: per-request cost of the token-bucket check and middleware
+
+Usage (from backend/): python benchmarks/rate_limit.py [--requests 200000] [--clients 5000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import DEFAULT_RULE, RateLimiter, RateLimitMiddleware, RateRule
+
+PATHS = [("GET", "/listings"), ("GET", "/deals/%23EZ001Y"), ("POST", "/deals"),
+         ("GET", "/orderbook"), ("GET", "/admin/pending-deals")]
+
+def report(label, elapsed, n):
+    print(f"{label:>32}: {elapsed / n * 1e6:7.2f}us per request")
+
+async def noop_app(scope, receive, send):
+    pass
+
+async def noop_send(message):
+    pass
+
+async def middleware_loop(app, scopes):
+    for scope in scopes:
+        await app(scope, None, noop_send)
+
+def main(args):
+    # Budgets high enough that every request is admitted and takes the full path
+    rules = tuple(RateRule(name, None, prefix, 1e9, 10 ** 9)
+                  for name, prefix in (("deals", "/deals/"), ("admin", "/admin/"), ("listings", "/listings")))
+    default = DEFAULT_RULE._replace(per_minute=1e9, burst=10 ** 9)
+    clients = [f"10.0.{i // 256}.{i % 256}" for i in range(args.clients)]
+    scopes = [
+        {"type": "http", "method": method, "path": path, "headers": [], "client": (clients[i % len(clients)], 4000)}
+        for i, (method, path) in enumerate(PATHS[i % len(PATHS)] for i in range(args.requests))
+    ]
+
+    limiter = RateLimiter(rules, default, max_clients=args.clients * len(PATHS))
+    start = time.perf_counter()
+    for scope in scopes:
+        limiter.hit(limiter.rule_for(scope["method"], scope["path"]), limiter.client_for(scope))
+    report("rule + client + bucket", time.perf_counter() - start, len(scopes))
+
+    # Evicting on every new client: more clients than the LRU holds
+    limiter = RateLimiter(rules, default, max_clients=max(1, args.clients // 10))
+    start = time.perf_counter()
+    for scope in scopes:
+        limiter.hit(limiter.rule_for(scope["method"], scope["path"]), limiter.client_for(scope))
+    report("same, with LRU eviction", time.perf_counter() - start, len(scopes))
+
+    start = time.perf_counter()
+    asyncio.run(middleware_loop(noop_app, scopes))
+    bare = time.perf_counter() - start
+    limiter = RateLimiter(rules, default, max_clients=args.clients * len(PATHS))
+    start = time.perf_counter()
+    asyncio.run(middleware_loop(RateLimitMiddleware(noop_app, limiter), scopes))
+    report("middleware overhead", time.perf_counter() - start - bare, len(scopes))
+    print("rejected:", limiter.rejected, "evicted:", limiter.evicted)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--clients", type=int, default=5000)
+    main(parser.parse_args())
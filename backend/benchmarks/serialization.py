@@ -0,0 +1,65 @@
+"""
+Serialization benchmark: FastAPI's response_model path vs the pre-encoded fast path
+
+Usage (from backend/): python benchmarks/serialization.py [--rows 1000] [--rounds 50]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from models import Listing, User
+from schemas import ListingResponse, ListingsResponse
+from serializers import item_json, page_json, page_from_rows
+
+def rows(n):
+    now = datetime(2025, 1, 1, 12, 30)
+    users = [
+        User(id=u, name=f"maker{u}", telegram_username=f"maker{u}", telegram_id=str(u), type="both",
+             verified=bool(u % 2), created_at=now)
+        for u in range(1, 51)
+    ]
+    return [
+        Listing(id=i, user_id=1 + i % 50, user=users[i % 50], type="buy" if i % 2 else "sell",
+                amount=Decimal("250.50"), rate=Decimal("118.75") + i % 9,
+                min_amount=Decimal("10"), max_amount=Decimal("250.50"),
+                payment_method="Telebirr", contact="@maker", description=f"Listing {i}",
+                status="active", created_at=now, updated_at=now)
+        for i in range(1, n + 1)
+    ]
+
+def timed(label, rounds, fn):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        body = fn()
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"{label:>28}: {elapsed * 1000:8.2f}ms per page")
+    return body
+
+def main(args):
+    data = rows(args.rows)
+    cached = [item_json(row, ListingResponse) for row in data]
+    reference = timed("response_model + encoder", args.rounds, lambda: JSONResponse(
+        jsonable_encoder(ListingsResponse(success=True, data=data, total=len(data)))
+    ).body)
+    fast = timed("fast path (from rows)", args.rounds,
+                 lambda: page_from_rows(data, ListingResponse, len(data), None))
+    book = timed("fast path (pre-encoded)", args.rounds,
+                 lambda: page_json(cached, len(data), None))
+    print("identical bytes:", reference == fast == book)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,85 @@
+"""
+SQLite storage profile benchmark: mixed read/write throughput, stock settings vs the tuned profile
+
+Each profile runs in a fresh subprocess (the profile is read at import time)
+against its own throwaway database file.
+
+Usage (from backend/): python benchmarks/sqlite_profile.py [--readers 16] [--writers 4] [--seconds 5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+async def workload(args):
+    sys.path.insert(0, BACKEND_DIR)
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await main.startup_event()
+        for name in ("seller", "buyer"):
+            await client.post("/users", json={"name": name, "telegram_username": name, "telegram_id": name})
+        await client.post("/listings", json={
+            "user_id": 1, "type": "sell", "amount": "1000", "rate": "120",
+            "payment_method": "Telebirr", "contact": "@seller"
+        })
+        deal = {"listing_id": 1, "buyer_id": 2, "seller_id": 1, "usdt_amount": "1",
+                "etb_amount": "120", "payment_method": "Telebirr"}
+        for _ in range(200):
+            await client.post("/deals", json=deal)
+
+        reads, writes = [0], [0]
+        deadline = time.perf_counter() + args.seconds
+
+        async def reader():
+            while time.perf_counter() < deadline:
+                await client.get("/admin/pending-deals", params={"status": "pending", "limit": 20})
+                await client.get("/users/1")
+                reads[0] += 2
+
+        async def writer():
+            while time.perf_counter() < deadline:
+                await client.post("/deals", json=deal)
+                writes[0] += 1
+
+        await asyncio.gather(*(reader() for _ in range(args.readers)),
+                             *(writer() for _ in range(args.writers)))
+        await main.shutdown_event()
+    print(json.dumps({"reads_per_s": reads[0] / args.seconds, "writes_per_s": writes[0] / args.seconds}))
+
+def run_profile(profile, args):
+    env = dict(os.environ,
+               SQLITE_PROFILE=profile,
+               DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/bench.db",
+               LOG_ARCHIVE_DIR=tempfile.mkdtemp(),
+               DEAL_EXPIRY_INTERVAL_SECONDS="3600",
+               RATE_LIMIT_ENABLED="false")
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", __file__, "--child",
+         "--readers", str(args.readers), "--writers", str(args.writers), "--seconds", str(args.seconds)],
+        env=env, cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(workload(args))
+    else:
+        for profile in ("default", "tuned"):
+            result = run_profile(profile, args)
+            print(f"{profile:>8}: {result['reads_per_s']:8.0f} reads/s  {result['writes_per_s']:7.0f} writes/s")
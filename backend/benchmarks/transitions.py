@@ -0,0 +1,143 @@
+"""
+Deal transition stress test: exactly one of N concurrent confirms/releases may win
+
+Usage (from backend/): python benchmarks/transitions.py [--deals 20] [--concurrency 16] [--flask]
+
+Fires --concurrency simultaneous POST /confirm-payment and then
+POST /admin/release-funds requests at each deal and checks that exactly one
+of each succeeds, the rest get 400, the deal ends up released and exactly one
+audit row exists per transition. --flask runs the same check against the
+Flask app from a thread pool. Exits non-zero on any violation.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Run against a throwaway database, never the real one
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ["LOG_ARCHIVE_DIR"] = tempfile.mkdtemp()
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["RELEASE_SECRET"] = "stress"
+os.environ["AUDIT_DURABILITY"] = "sync"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+DEAL = {"listing_id": 1, "buyer_id": 2, "seller_id": 1,
+        "usdt_amount": "10", "etb_amount": "1200", "payment_method": "Telebirr"}
+
+def check(label, statuses, failures):
+    won = statuses.count(200)
+    lost = statuses.count(400)
+    if won != 1 or won + lost != len(statuses):
+        failures.append(f"{label}: {statuses}")
+
+async def stress_fastapi(args, failures):
+    import main
+    from sqlalchemy import select, func
+    from models import Deal, Log
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://stress", timeout=60) as client:
+        await main.startup_event()
+        try:
+            for name in ("seller", "buyer"):
+                await client.post("/users", json={"name": name, "telegram_username": name, "telegram_id": name})
+            await client.post("/listings", json={
+                "user_id": 1, "type": "sell", "amount": "100000", "rate": "120",
+                "payment_method": "Telebirr", "contact": "@seller"
+            })
+            start = time.perf_counter()
+            for _ in range(args.deals):
+                code = (await client.post("/deals", json=DEAL)).json()["data"]["trade_code"]
+                confirms = await asyncio.gather(*(
+                    client.post("/confirm-payment", json={"trade_code": code, "user_id": 1})
+                    for _ in range(args.concurrency)
+                ))
+                check(f"confirm {code}", [r.status_code for r in confirms], failures)
+                releases = await asyncio.gather(*(
+                    client.post("/admin/release-funds", json={"trade_code": code, "release_secret": "stress"})
+                    for _ in range(args.concurrency)
+                ))
+                check(f"release {code}", [r.status_code for r in releases], failures)
+            elapsed = time.perf_counter() - start
+
+            async with main.AsyncSessionLocal() as db:
+                released = await db.scalar(select(func.count(Deal.id)).where(Deal.status == "released"))
+                for action in ("payment_confirmed", "funds_released"):
+                    logged = await db.scalar(select(func.count(Log.id)).where(Log.action == action))
+                    if logged != args.deals:
+                        failures.append(f"{logged} {action} audit rows for {args.deals} deals")
+            if released != args.deals:
+                failures.append(f"{released} of {args.deals} deals released")
+            if main.platform_stats.deals_by_status["released"] != args.deals:
+                failures.append(f"stats count {main.platform_stats.deals_by_status['released']} released deals")
+        finally:
+            await main.shutdown_event()
+    print(f"fastapi: {args.deals} deals x {args.concurrency} concurrent confirms + releases "
+          f"in {elapsed:.2f}s")
+
+def stress_flask(args, failures):
+    os.chdir(tempfile.mkdtemp())  # app.py uses ./p2p_trading.db
+    import sqlite3
+    import app as flask_app
+
+    flask_app.RELEASE_SECRET = "stress"
+    flask_app.init_db()
+    client = flask_app.app.test_client()
+    for name in ("seller", "buyer"):
+        client.post("/users", json={"name": name, "telegram_username": name, "telegram_id": name, "type": "both"})
+    client.post("/listings", json={
+        "user_id": 1, "type": "sell", "amount": 100000, "rate": 120,
+        "payment_method": "Telebirr", "contact": "@seller"
+    })
+
+    def post(path, body):
+        # Each thread gets its own client; sqlite3 connections are per request
+        return flask_app.app.test_client().post(path, json=body).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.deals):
+            code = client.post("/deals", json=DEAL).get_json()["data"]["trade_code"]
+            confirms = list(pool.map(lambda _: post("/confirm-payment", {"trade_code": code}),
+                                     range(args.concurrency)))
+            check(f"flask confirm {code}", confirms, failures)
+            releases = list(pool.map(
+                lambda _: post("/admin/release-funds", {"trade_code": code, "release_secret": "stress"}),
+                range(args.concurrency)
+            ))
+            check(f"flask release {code}", releases, failures)
+    elapsed = time.perf_counter() - start
+
+    conn = sqlite3.connect("p2p_trading.db")
+    for action in ("payment_confirmed", "funds_released"):
+        logged = conn.execute("SELECT COUNT(*) FROM logs WHERE action = ?", (action,)).fetchone()[0]
+        if logged != args.deals:
+            failures.append(f"flask: {logged} {action} audit rows for {args.deals} deals")
+    conn.close()
+    print(f"flask: {args.deals} deals x {args.concurrency} concurrent confirms + releases "
+          f"in {elapsed:.2f}s")
+
+def main(args):
+    failures = []
+    if args.flask:
+        stress_flask(args, failures)
+    else:
+        asyncio.run(stress_fastapi(args, failures))
+    for failure in failures:
+        print("FAIL", failure)
+    print("exactly one winner per transition" if not failures else f"{len(failures)} violations")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--deals", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--flask", action="store_true", help="stress the Flask app instead of FastAPI")
+    main(parser.parse_args())
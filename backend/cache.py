@@ -0,0 +1,41 @@
+"""
+Versioned cache of serialized listing pages with ETag support
+"""
+
+import uuid
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+class ListingsCache:
+    """LRU of response bodies keyed by filter parameters, dropped on every version bump"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.version = 0
+        # Boot id keeps ETags from a previous process from matching after a restart
+        self.boot_id = uuid.uuid4().hex[:8]
+        self.pages: "OrderedDict[Hashable, bytes]" = OrderedDict()
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.boot_id}-{self.version}"'
+
+    def bump(self):
+        """Invalidate every cached page after a listing or deal write"""
+        self.version += 1
+        self.pages.clear()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        body = self.pages.get(key)
+        if body is not None:
+            self.pages.move_to_end(key)
+        return body
+
+    def put(self, key: Hashable, body: bytes):
+        self.pages[key] = body
+        self.pages.move_to_end(key)
+        while len(self.pages) > self.max_entries:
+            self.pages.popitem(last=False)
+
+# Process-wide listings cache
+listings_cache = ListingsCache()
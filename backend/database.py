@@ -2,9 +2,12 @@
 Database connection and session management
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from models import Base
+from search import create_search_index
+from slow_queries import SLOW_QUERY_LOG, slow_query_log
 import os
 from dotenv import load_dotenv
 
@@ -14,29 +17,123 @@ load_dotenv()
 # Database URL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./database/p2p_trading.db")
 
-# Create engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    if url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url[len("postgres://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    return url
+
+# Async database URL (override to point at a different async driver)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+# Read-only endpoints use their own pool (set to point reads at a replica)
+ASYNC_READ_DATABASE_URL = os.getenv("ASYNC_READ_DATABASE_URL", ASYNC_DATABASE_URL)
+READ_POOL_SIZE = int(os.getenv("READ_POOL_SIZE", "8"))
+
+IS_SQLITE = "sqlite" in DATABASE_URL
+IS_SQLITE_MEMORY = IS_SQLITE and (":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/").endswith("sqlite:"))
+
+# SQLite storage profile: "tuned" (WAL, relaxed fsync, mmap, bigger page cache)
+# or "default" to leave SQLite's stock rollback-journal settings alone
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "tuned")
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+
+connect_args = {"check_same_thread": False} if IS_SQLITE else {}
+
+def sqlite_pragmas(read_only: bool = False):
+    """Connect listener applying the storage profile to every new SQLite connection"""
+    def apply(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if SQLITE_PROFILE == "tuned":
+            for name, value in SQLITE_PRAGMAS.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return apply
+
+# Create engines: the async engines serve the API, the sync one is kept for scripts
+engine = create_engine(DATABASE_URL, connect_args=connect_args)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args=connect_args)
+
+# A separate reader pool only pays off with WAL (readers never wait on the writer)
+if IS_SQLITE_MEMORY or (IS_SQLITE and SQLITE_PROFILE != "tuned"):
+    async_read_engine = async_engine
+else:
+    async_read_engine = create_async_engine(
+        ASYNC_READ_DATABASE_URL,
+        connect_args=connect_args,
+        pool_size=READ_POOL_SIZE
+    )
+
+if IS_SQLITE and not IS_SQLITE_MEMORY:
+    event.listen(engine, "connect", sqlite_pragmas())
+    event.listen(async_engine.sync_engine, "connect", sqlite_pragmas())
+    if async_read_engine is not async_engine:
+        event.listen(async_read_engine.sync_engine, "connect", sqlite_pragmas(read_only=True))
 
-# Create session factory
+# Opt-in slow-query log (GET /admin/slow-queries)
+if SLOW_QUERY_LOG:
+    for instrumented in (engine, async_engine, async_read_engine):
+        slow_query_log.instrument(instrumented)
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=async_read_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
-def create_tables():
-    """Create all tables"""
-    Base.metadata.create_all(bind=engine)
+def _create_schema(conn):
+    Base.metadata.create_all(conn)
+    # create_all skips tables that already exist, so add any new indexes explicitly
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    create_search_index(conn)
 
-def get_db():
-    """Get database session"""
+async def create_tables():
+    """Create all tables and indexes"""
+    async with async_engine.begin() as conn:
+        await conn.run_sync(_create_schema)
+
+async def get_db():
+    """Get async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db():
+    """Get async database session from the read-only pool"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+def get_sync_db():
+    """Get blocking database session (scripts and background tools only)"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
-def init_database():
+async def init_database():
     """Initialize database with tables"""
-    create_tables()
+    await create_tables()
     print("✅ Database tables created successfully")
-
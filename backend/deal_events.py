@@ -0,0 +1,124 @@
+"""
+In-process pub/sub for live deal status updates
+
+Watchers of a deal (SSE streams and WebSockets on /deals/{trade_code}/...)
+each get a small queue registered under the deal id. The transition
+endpoints and the expiry sweep publish after they commit; an event is
+encoded once and handed to every watcher's queue. An idle watcher is a
+coroutine parked on its queue, so it costs no CPU and no database reads
+until something happens; one shared heartbeat queues keep-alives for idle
+SSE streams. Like the other in-memory state this assumes a single worker
+process.
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+DEAL_EVENTS_MAX_WATCHERS = int(os.getenv("DEAL_EVENTS_MAX_WATCHERS", "10000"))
+DEAL_EVENTS_KEEPALIVE_SECONDS = float(os.getenv("DEAL_EVENTS_KEEPALIVE_SECONDS", "20"))
+WATCHER_QUEUE_SIZE = 8
+# A deal in one of these states never changes again, so its streams end
+FINAL_STATUSES = frozenset(("released", "cancelled"))
+# Queued to idle watchers by the heartbeat; None ends a stream
+KEEPALIVE = "keepalive"
+
+class DealEvent:
+    """One status change, encoded once for every watcher"""
+
+    __slots__ = ("status", "sse", "ws")
+
+    def __init__(self, name: str, status: str, data: dict):
+        payload = json.dumps(data, separators=(",", ":"))
+        self.status = status
+        self.sse = f"event: {name}\ndata: {payload}\n\n".encode()
+        self.ws = f'{{"event":"{name}","data":{payload}}}'
+
+class DealEvents:
+    """Watcher queues per deal id"""
+
+    def __init__(self, max_watchers: int = DEAL_EVENTS_MAX_WATCHERS,
+                 keepalive: float = DEAL_EVENTS_KEEPALIVE_SECONDS):
+        self.max_watchers = max_watchers
+        self.keepalive = keepalive
+        self._task: Optional[asyncio.Task] = None
+        self.watchers: Dict[int, Set[asyncio.Queue]] = {}
+        self.watcher_count = 0
+        # Metrics
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, deal_id: int) -> Optional[asyncio.Queue]:
+        """Register a watcher; None when the watcher limit is reached"""
+        if self.watcher_count >= self.max_watchers:
+            return None
+        queue = asyncio.Queue(WATCHER_QUEUE_SIZE)
+        self.watchers.setdefault(deal_id, set()).add(queue)
+        self.watcher_count += 1
+        return queue
+
+    def unsubscribe(self, deal_id: int, queue: asyncio.Queue):
+        queues = self.watchers.get(deal_id)
+        if queues is None or queue not in queues:
+            return
+        queues.discard(queue)
+        self.watcher_count -= 1
+        if not queues:
+            del self.watchers[deal_id]
+
+    def publish(self, deal_id: int, trade_code: str, status: str, previous_status: str = None):
+        """Send a status change to the deal's watchers (call after the commit)"""
+        queues = self.watchers.get(deal_id)
+        if not queues:
+            return
+        event = DealEvent("status", status, {
+            "trade_code": trade_code,
+            "status": status,
+            "previous_status": previous_status,
+            "at": datetime.utcnow().isoformat(),
+        })
+        self.published += 1
+        for queue in queues:
+            if queue.full():
+                # A watcher that stopped reading only needs the newest status
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+            self.delivered += 1
+
+    def heartbeat(self):
+        """Queue a keep-alive for every idle watcher, so proxies keep the stream open"""
+        for queues in self.watchers.values():
+            for queue in queues:
+                if queue.empty():
+                    queue.put_nowait(KEEPALIVE)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.keepalive)
+            self.heartbeat()
+
+    def start(self):
+        # One timer for all watchers instead of a timeout per idle stream
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the heartbeat and end every stream"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for queues in self.watchers.values():
+            for queue in queues:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+# Process-wide deal event hub
+deal_events = DealEvents()
@@ -0,0 +1,134 @@
+"""
+Background deal-expiry engine
+
+A periodic sweep walks the (status, expires_at) index for pending deals whose
+expiry has passed and cancels them in bulk: one guarded UPDATE ... RETURNING
+per batch plus the matching audit rows, committed together.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, update, insert, func
+
+from models import Deal, Log
+from stats import platform_stats
+from deal_events import deal_events
+
+logger = logging.getLogger(__name__)
+
+DEAL_EXPIRY_INTERVAL_SECONDS = float(os.getenv("DEAL_EXPIRY_INTERVAL_SECONDS", "30"))
+DEAL_EXPIRY_BATCH_SIZE = int(os.getenv("DEAL_EXPIRY_BATCH_SIZE", "500"))
+
+def expire_statement(now: datetime, batch_size: int):
+    """Guarded UPDATE ... RETURNING cancelling the batch_size longest-overdue pending deals"""
+    overdue = (
+        select(Deal.id)
+        .where(Deal.status == "pending", Deal.expires_at <= now)
+        .order_by(Deal.expires_at)
+        .limit(batch_size)
+    )
+    return (
+        update(Deal)
+        .where(Deal.id.in_(overdue), Deal.status == "pending")
+        .values(status="cancelled", updated_at=now)
+        .returning(Deal.id, Deal.trade_code)
+        .execution_options(synchronize_session=False)
+    )
+
+def backlog_query(now: datetime):
+    """Pending deals already past their expiry"""
+    return select(func.count(Deal.id)).where(Deal.status == "pending", Deal.expires_at <= now)
+
+class DealExpiry:
+    """Periodically moves overdue pending deals to cancelled"""
+
+    def __init__(self, interval: float = DEAL_EXPIRY_INTERVAL_SECONDS,
+                 batch_size: int = DEAL_EXPIRY_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.session_factory = None
+        self._task: Optional[asyncio.Task] = None
+        # Metrics
+        self.sweeps = 0
+        self.total_expired = 0
+        self.last_expired = 0
+        self.last_sweep_ms = 0.0
+        self.last_sweep_at: Optional[datetime] = None
+        self.backlog = 0
+
+    async def expire_batch(self, db, now: datetime):
+        """Cancel up to batch_size overdue deals; returns (id, trade_code) rows"""
+        rows = (await db.execute(expire_statement(now, self.batch_size))).all()
+        if rows:
+            await db.execute(insert(Log), [
+                {"deal_id": deal_id, "action": "deal_expired", "timestamp": now,
+                 "notes": f"Deal {trade_code} expired before payment"}
+                for deal_id, trade_code in rows
+            ])
+        return rows
+
+    async def sweep(self) -> int:
+        """Expire every overdue deal, one transaction per batch"""
+        start = time.perf_counter()
+        now = datetime.utcnow()
+        expired = 0
+        while True:
+            async with self.session_factory() as db:
+                rows = await self.expire_batch(db, now)
+                await db.commit()
+            if rows:
+                platform_stats.deal_transition("pending", "cancelled", count=len(rows))
+                for deal_id, trade_code in rows:
+                    deal_events.publish(deal_id, trade_code, "cancelled", "pending")
+            expired += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        async with self.session_factory() as db:
+            self.backlog = await db.scalar(backlog_query(datetime.utcnow()))
+        self.sweeps += 1
+        self.last_expired = expired
+        self.total_expired += expired
+        self.last_sweep_ms = (time.perf_counter() - start) * 1000
+        self.last_sweep_at = now
+        return expired
+
+    async def run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Deal expiry sweep failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self, session_factory):
+        """Start the periodic sweep on the running event loop"""
+        self.session_factory = session_factory
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            "sweeps": self.sweeps,
+            "total_expired": self.total_expired,
+            "last_expired": self.last_expired,
+            "last_sweep_ms": round(self.last_sweep_ms, 3),
+            "last_sweep_at": self.last_sweep_at.isoformat() if self.last_sweep_at else None,
+            "backlog": self.backlog,
+            "interval_seconds": self.interval
+        }
+
+# Process-wide expiry engine
+deal_expiry = DealExpiry()
@@ -0,0 +1,205 @@
+"""
+Idempotency-Key support for retried POSTs
+
+Clients (the Telegram bot, mobile retries, double taps) send an
+Idempotency-Key header. The first request with a key runs normally and a
+successful response is stored with a TTL; later requests with the same key
+and body get the stored response back without touching the endpoint.
+Duplicates that arrive while the first is still running wait for it and share
+its response if it was stored; otherwise they run one at a time. Reusing a key with a different
+body is rejected with 422. Failed (non-2xx) responses are not stored, so a
+corrected request can be retried under the same key.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+
+from models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_PURGE_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_SECONDS", "3600"))
+IDEMPOTENT_PATHS = ("/deals", "/listings", "/confirm-payment", "/admin/release-funds")
+MAX_KEY_LENGTH = 100
+
+@dataclass
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: bytes
+
+class IdempotencyKeys:
+    """Stored responses per (endpoint, key) plus the requests currently in flight"""
+
+    def __init__(self, ttl: timedelta = timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+                 purge_interval: float = IDEMPOTENCY_PURGE_SECONDS):
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.session_factory = None
+        self.inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+        # Metrics
+        self.replayed = 0
+        self.coalesced = 0
+
+    async def lookup(self, endpoint: str, key: str) -> Optional[StoredResponse]:
+        async with self.session_factory() as db:
+            row = await db.get(IdempotencyKey, (endpoint, key))
+        if row is None or row.expires_at <= datetime.utcnow():
+            return None
+        return StoredResponse(row.request_hash, row.status_code, row.response_body.encode())
+
+    async def save(self, endpoint: str, key: str, response: StoredResponse):
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            await db.merge(IdempotencyKey(
+                endpoint=endpoint, key=key, request_hash=response.request_hash,
+                status_code=response.status_code, response_body=response.body.decode(),
+                created_at=now, expires_at=now + self.ttl
+            ))
+            try:
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+
+    async def purge(self) -> int:
+        async with self.session_factory() as db:
+            result = await db.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())
+            )
+            await db.commit()
+        return result.rowcount
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            try:
+                await self.purge()
+            except Exception:
+                logger.exception("Idempotency key purge failed")
+
+    def start(self, session_factory):
+        """Use the given sessions for storage and purge expired keys periodically"""
+        self.session_factory = session_factory
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Process-wide key store
+idempotency_keys = IdempotencyKeys()
+
+async def _send_json(send, status: int, body: bytes, replayed: bool = False):
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if replayed:
+        headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+def _error(detail: str) -> bytes:
+    return json.dumps({"detail": detail}, separators=(",", ":")).encode()
+
+class IdempotencyMiddleware:
+    """ASGI middleware applying Idempotency-Key semantics to selected POST paths"""
+
+    def __init__(self, app, paths=IDEMPOTENT_PATHS, keys: IdempotencyKeys = None):
+        self.app = app
+        self.paths = set(paths)
+        self.keys = keys or idempotency_keys
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        key = next((v for k, v in scope["headers"] if k == b"idempotency-key"), None)
+        if key is None or self.keys.session_factory is None:
+            return await self.app(scope, receive, send)
+        key = key.decode("latin-1").strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return await _send_json(send, 400, _error(f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"))
+
+        # Buffer the body to hash it, then hand it to the app unchanged
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        request_hash = hashlib.sha256(body).hexdigest()
+        endpoint = scope["path"]
+        slot = (endpoint, key)
+
+        # A duplicate of a request still in flight waits for its outcome. If that
+        # response was not stored (an error or a crash) the duplicate runs itself,
+        # after any other duplicate that got there first
+        while slot in self.keys.inflight:
+            stored = await asyncio.shield(self.keys.inflight[slot])
+            if stored is not None:
+                self.keys.coalesced += 1
+                return await self._replay(send, stored, request_hash)
+
+        future = asyncio.get_running_loop().create_future()
+        self.keys.inflight[slot] = future
+        saved = None
+        try:
+            stored = await self.keys.lookup(endpoint, key)
+            if stored is not None:
+                self.keys.replayed += 1
+                saved = stored
+                return await self._replay(send, stored, request_hash)
+            stored = await self._execute(scope, receive, send, body, request_hash)
+            if 200 <= stored.status_code < 300:
+                await self.keys.save(endpoint, key, stored)
+                saved = stored
+        finally:
+            # Waiters replay what was stored, or get None and run themselves
+            future.set_result(saved)
+            if self.keys.inflight.get(slot) is future:
+                del self.keys.inflight[slot]
+
+    async def _replay(self, send, stored: StoredResponse, request_hash: str):
+        if stored.request_hash != request_hash:
+            return await _send_json(send, 422, _error("Idempotency-Key was already used with a different request body"))
+        await _send_json(send, stored.status_code, stored.body, replayed=True)
+
+    async def _execute(self, scope, receive, send, body: bytes, request_hash: str) -> Optional[StoredResponse]:
+        """Run the endpoint, forwarding its response while keeping a copy"""
+        sent_body = False
+        status = 500
+        parts = []
+
+        async def replay_receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def capture_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                parts.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, replay_receive, capture_send)
+        return StoredResponse(request_hash, status, b"".join(parts))
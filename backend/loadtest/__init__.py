@@ -0,0 +1,10 @@
+"""
+End-to-end load testing for the FastAPI backend
+
+Seeds a SQLite database with configurable volumes, drives main.py in-process
+through httpx's ASGI transport (or a local uvicorn), runs a weighted mix of
+user scenarios and reports throughput plus latency percentiles per endpoint
+as JSON, so runs can be diffed across commits.
+
+Usage (from backend/): python -m loadtest --help
+"""
@@ -0,0 +1,191 @@
+"""
+Load test runner
+
+Usage (from backend/):
+    python -m loadtest [--mix default] [--concurrency 20] [--duration 30]
+                       [--users 1000 --listings 5000 --deals 20000 --logs 50000]
+                       [--target asgi|uvicorn] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from loadtest.scenarios import MIXES, RELEASE_SECRET, SCENARIOS, Recorder, VirtualUser
+from loadtest.seed import Volumes, load_state, seed_database
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a sorted list of samples"""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for label in sorted(recorder.samples):
+        samples = sorted(recorder.samples[label])
+        endpoints[label] = {
+            "requests": len(samples),
+            "errors": recorder.errors.get(label, 0),
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "mean_ms": round(sum(samples) / len(samples), 3),
+            "p50_ms": round(percentile(samples, 50), 3),
+            "p95_ms": round(percentile(samples, 95), 3),
+            "p99_ms": round(percentile(samples, 99), 3),
+            "max_ms": round(samples[-1], 3),
+        }
+    requests = sum(e["requests"] for e in endpoints.values())
+    return {
+        "total": {
+            "requests": requests,
+            "errors": sum(e["errors"] for e in endpoints.values()),
+            "throughput_rps": round(requests / elapsed, 2),
+            "elapsed_seconds": round(elapsed, 3),
+        },
+        "endpoints": endpoints,
+    }
+
+async def drive(client: httpx.AsyncClient, state, args) -> dict:
+    """Run virtual users against the client: warm-up first, then the measured window"""
+    names, weights = zip(*MIXES[args.mix].items())
+    recorder = Recorder()
+
+    async def virtual_user(n, deadline):
+        user = VirtualUser(client, state, recorder, seed=args.seed * 1000 + n)
+        while time.perf_counter() < deadline:
+            scenario = user.rng.choices(names, weights)[0]
+            await SCENARIOS[scenario](user)
+
+    if args.warmup > 0:
+        recorder.enabled = False
+        deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(*(virtual_user(n, deadline) for n in range(args.concurrency)))
+        recorder.enabled = True
+
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(virtual_user(n, deadline) for n in range(args.concurrency)))
+    return summarize(recorder, time.perf_counter() - start)
+
+async def run_asgi(state, args) -> dict:
+    import main
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        # Keep stdout for the JSON report
+        with contextlib.redirect_stdout(sys.stderr):
+            await main.startup_event()
+        try:
+            return await drive(client, state, args)
+        finally:
+            await main.shutdown_event()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def run_uvicorn(state, args) -> dict:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=os.environ.copy(), stdout=sys.stderr
+    )
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits,
+                                     timeout=30) as client:
+            for _ in range(300):
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not become healthy")
+            return await drive(client, state, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(args):
+    database_url = args.database or f"sqlite:///{tempfile.mkdtemp()}/loadtest.db"
+    # main.py reads its configuration at import time (and uvicorn inherits the env)
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["RELEASE_SECRET"] = RELEASE_SECRET
+    # Seeded old logs must never land in the real log archive
+    os.environ["LOG_ARCHIVE_DIR"] = tempfile.mkdtemp()
+    # Every virtual user shares one client address; measure the app, not the limiter
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    volumes = Volumes(args.users, args.listings, args.deals, args.logs)
+    seed_seconds = None
+    if not args.no_seed:
+        start = time.perf_counter()
+        seed_database(database_url, volumes, args.seed)
+        seed_seconds = round(time.perf_counter() - start, 3)
+    state = load_state(database_url)
+
+    runner = run_asgi if args.target == "asgi" else run_uvicorn
+    started_at = datetime.utcnow()
+    results = asyncio.run(runner(state, args))
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": started_at.isoformat(),
+            "target": args.target,
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup,
+            "seed": args.seed,
+            "volumes": None if args.no_seed else vars(volumes),
+            "seed_seconds": seed_seconds,
+        },
+        **results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m loadtest",
+                                     description="End-to-end load test of the FastAPI backend")
+    parser.add_argument("--target", choices=("asgi", "uvicorn"), default="asgi",
+                        help="drive main.app in-process or through a local uvicorn (default: asgi)")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before the run")
+    parser.add_argument("--database", help="SQLite URL (default: a throwaway file)")
+    parser.add_argument("--no-seed", action="store_true", help="reuse an already seeded --database")
+    parser.add_argument("--users", type=int, default=Volumes.users)
+    parser.add_argument("--listings", type=int, default=Volumes.listings)
+    parser.add_argument("--deals", type=int, default=Volumes.deals)
+    parser.add_argument("--logs", type=int, default=Volumes.logs)
+    parser.add_argument("--seed", type=int, default=1, help="random seed for data and scenarios")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    main(parser.parse_args())
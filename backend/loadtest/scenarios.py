@@ -0,0 +1,127 @@
+"""
+User scenarios and the mixes that weight them
+
+A scenario is one user journey (a few requests). Every request is timed and
+recorded under its route template, e.g. "GET /deals/{trade_code}", so results
+aggregate per endpoint rather than per URL.
+"""
+
+import random
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+import httpx
+
+from loadtest.seed import SeedState
+
+RELEASE_SECRET = "loadtest"
+
+class Recorder:
+    """Latency samples and error counts per endpoint"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.enabled = True
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            failed = response.status_code >= 500
+        except httpx.HTTPError:
+            response, failed = None, True
+        if self.enabled:
+            self.samples[label].append((time.perf_counter() - start) * 1000)
+            if failed:
+                self.errors[label] += 1
+        return response
+
+class VirtualUser:
+    """One virtual user: a client, the shared seed state and its own random stream"""
+
+    def __init__(self, client: httpx.AsyncClient, state: SeedState, recorder: Recorder, seed: int):
+        self.client = client
+        self.state = state
+        self.recorder = recorder
+        self.rng = random.Random(seed)
+
+    async def call(self, label: str, url: str = None, **kwargs):
+        method, _, path = label.partition(" ")
+        return await self.recorder.request(self.client, label, method, url or path, **kwargs)
+
+async def browse(s: VirtualUser):
+    """Open the listings page, sometimes page forward, glance at the market"""
+    params = {"type": s.rng.choice(("buy", "sell")), "sort": s.rng.choice(("created_at", "rate")),
+              "limit": 20}
+    response = await s.call("GET /listings", params=params)
+    if response is not None and response.status_code == 200 and s.rng.random() < 0.3:
+        cursor = response.json().get("next_cursor")
+        if cursor:
+            await s.call("GET /listings", params={**params, "cursor": cursor, "with_total": "false"})
+    if s.rng.random() < 0.2:
+        await s.call("GET /market/summary")
+
+async def search(s: VirtualUser):
+    await s.call("GET /listings/search", params={"q": s.rng.choice(s.state.search_terms)})
+
+async def view_deal(s: VirtualUser):
+    codes = s.state.released or s.state.paid
+    if not codes:
+        return await browse(s)
+    code = s.rng.choice(codes)
+    await s.call("GET /deals/{trade_code}", f"/deals/{code.replace('#', '%23')}")
+
+async def create_deal(s: VirtualUser):
+    """Take an active listing; the listing owner is the seller"""
+    if not s.state.listings or len(s.state.user_ids) < 2:
+        return await browse(s)
+    listing_id = s.rng.choice(s.state.listing_ids)
+    owner_id, _ = s.state.listings[listing_id]
+    buyer_id = s.rng.choice(s.state.user_ids)
+    while buyer_id == owner_id:
+        buyer_id = s.rng.choice(s.state.user_ids)
+    usdt = s.rng.randint(10, 200)
+    response = await s.call("POST /deals", json={
+        "listing_id": listing_id, "buyer_id": buyer_id, "seller_id": owner_id,
+        "usdt_amount": str(usdt), "etb_amount": str(usdt * 120), "payment_method": "Telebirr"
+    })
+    if response is not None and response.status_code == 200:
+        s.state.pending.append((response.json()["data"]["trade_code"], owner_id))
+
+async def confirm_payment(s: VirtualUser):
+    if not s.state.pending:
+        return await create_deal(s)
+    trade_code, seller_id = s.state.pending.pop(s.rng.randrange(len(s.state.pending)))
+    response = await s.call("POST /confirm-payment", json={"trade_code": trade_code, "user_id": seller_id})
+    if response is not None and response.status_code == 200:
+        s.state.paid.append(trade_code)
+
+async def admin_release(s: VirtualUser):
+    """Review the queue of paid deals, then release one"""
+    await s.call("GET /admin/pending-deals", params={"status": "paid", "limit": 20, "with_total": "false"})
+    if not s.state.paid:
+        return
+    trade_code = s.state.paid.pop(s.rng.randrange(len(s.state.paid)))
+    response = await s.call("POST /admin/release-funds",
+                            json={"trade_code": trade_code, "release_secret": RELEASE_SECRET})
+    if response is not None and response.status_code == 200:
+        s.state.released.append(trade_code)
+
+SCENARIOS: Dict[str, Callable] = {
+    "browse": browse,
+    "search": search,
+    "view_deal": view_deal,
+    "create_deal": create_deal,
+    "confirm_payment": confirm_payment,
+    "admin_release": admin_release,
+}
+
+# Scenario weights per mix
+MIXES: Dict[str, Dict[str, int]] = {
+    "default": {"browse": 55, "search": 10, "view_deal": 10, "create_deal": 12,
+                "confirm_payment": 8, "admin_release": 5},
+    "read-heavy": {"browse": 75, "search": 15, "view_deal": 10},
+    "write-heavy": {"browse": 20, "create_deal": 40, "confirm_payment": 25, "admin_release": 15},
+}
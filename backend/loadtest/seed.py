@@ -0,0 +1,145 @@
+"""
+Database seeding for load tests
+
+Rows are bulk-inserted with one executemany per table and batch, bypassing
+the API, so large volumes take seconds. The generator is seeded, so the same
+volumes and seed always produce the same database.
+"""
+
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Tuple
+
+from sqlalchemy import create_engine, insert, select
+
+from models import Base, User, Listing, Deal, Log
+from search import create_search_index
+from trade_codes import encode_trade_code
+
+BATCH_SIZE = 5000
+PAYMENT_METHODS = ["Telebirr", "CBE Birr", "Commercial Bank of Ethiopia", "Awash Bank",
+                   "Dashen Bank", "Bank of Abyssinia", "M-Pesa"]
+DESCRIPTION_WORDS = ["fast", "release", "trusted", "verified", "online", "instant", "bank",
+                     "transfer", "daytime", "evening", "negotiable", "bulk", "small", "orders"]
+DEAL_STATUSES = [("pending", 20), ("paid", 10), ("released", 55), ("cancelled", 15)]
+LOG_ACTIONS = ["deal_created", "payment_confirmed", "funds_released", "deal_expired"]
+
+@dataclass
+class Volumes:
+    users: int = 1000
+    listings: int = 5000
+    deals: int = 20000
+    logs: int = 50000
+
+@dataclass
+class SeedState:
+    """What scenarios need to know about the seeded data"""
+    user_ids: List[int] = field(default_factory=list)
+    # Active listing id -> (owner id, side)
+    listings: Dict[int, Tuple[int, str]] = field(default_factory=dict)
+    listing_ids: List[int] = field(default_factory=list)
+    # (trade code, seller id) of deals waiting for payment / for release
+    pending: List[Tuple[str, int]] = field(default_factory=list)
+    paid: List[str] = field(default_factory=list)
+    released: List[str] = field(default_factory=list)
+    search_terms: List[str] = field(default_factory=list)
+
+def _batches(rows, size=BATCH_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def _insert(conn, model, rows):
+    for batch in _batches(rows):
+        conn.execute(insert(model), batch)
+
+def seed_database(database_url: str, volumes: Volumes, seed: int = 1):
+    """Create the schema and fill it with synthetic users, listings, deals and logs"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        if conn.scalar(select(User.id).limit(1)) is not None:
+            raise RuntimeError(f"{database_url} already has data; seed an empty database")
+
+        _insert(conn, User, [
+            {"id": i, "name": f"Trader {i}", "telegram_username": f"trader{i}",
+             "telegram_id": str(100000 + i), "type": "both", "verified": rng.random() < 0.3,
+             "created_at": now - timedelta(days=rng.randint(1, 365))}
+            for i in range(1, volumes.users + 1)
+        ])
+
+        listings = []
+        for i in range(1, volumes.listings + 1):
+            created = now - timedelta(minutes=rng.randint(1, 60 * 24 * 30))
+            listings.append({
+                "id": i, "user_id": rng.randint(1, volumes.users),
+                "type": rng.choice(("buy", "sell")),
+                "amount": Decimal(rng.randint(50, 5000)),
+                "rate": Decimal(rng.randint(11500, 13000)) / 100,
+                "payment_method": rng.choice(PAYMENT_METHODS),
+                "contact": f"@trader{i}",
+                "description": " ".join(rng.sample(DESCRIPTION_WORDS, 3)),
+                "status": "active" if rng.random() < 0.9 else rng.choice(("inactive", "completed")),
+                "created_at": created, "updated_at": created,
+            })
+        _insert(conn, Listing, listings)
+
+        statuses, weights = zip(*DEAL_STATUSES)
+        deals = []
+        for i in range(1, volumes.deals + 1):
+            listing = rng.choice(listings)
+            status = rng.choices(statuses, weights)[0]
+            usdt = Decimal(rng.randint(10, 500))
+            created = now - timedelta(minutes=rng.randint(1, 60 * 24 * 7))
+            deals.append({
+                "id": i, "listing_id": listing["id"],
+                "buyer_id": rng.randint(1, volumes.users), "seller_id": listing["user_id"],
+                "usdt_amount": usdt, "etb_amount": usdt * listing["rate"],
+                "trade_code": encode_trade_code(i), "escrow_wallet": "TXloadtest",
+                "status": status, "payment_method": listing["payment_method"],
+                "commission_amount": usdt * Decimal("0.015"),
+                # Pending deals stay live for the whole run
+                "expires_at": now + timedelta(days=1) if status == "pending" else created + timedelta(minutes=90),
+                "created_at": created,
+                "updated_at": now - timedelta(minutes=rng.randint(0, 60 * 24)) if status == "released" else created,
+            })
+        _insert(conn, Deal, deals)
+
+        _insert(conn, Log, [
+            {"deal_id": rng.randint(1, volumes.deals) if volumes.deals else None,
+             "action": rng.choice(LOG_ACTIONS), "notes": "seeded",
+             "timestamp": now - timedelta(minutes=rng.randint(1, 60 * 24 * 90))}
+            for _ in range(volumes.logs)
+        ])
+
+        # Index the seeded listings in one rebuild rather than row by row
+        create_search_index(conn)
+    engine.dispose()
+
+def load_state(database_url: str) -> SeedState:
+    """Read back the ids and trade codes the scenarios draw from"""
+    engine = create_engine(database_url)
+    state = SeedState()
+    with engine.connect() as conn:
+        state.user_ids = list(conn.scalars(select(User.id)))
+        for listing_id, user_id, side in conn.execute(
+            select(Listing.id, Listing.user_id, Listing.type).where(Listing.status == "active")
+        ):
+            state.listings[listing_id] = (user_id, side)
+        state.listing_ids = list(state.listings)
+        for trade_code, seller_id, status in conn.execute(
+            select(Deal.trade_code, Deal.seller_id, Deal.status)
+            .where(Deal.status.in_(("pending", "paid", "released")))
+        ):
+            if status == "pending":
+                state.pending.append((trade_code, seller_id))
+            elif status == "paid":
+                state.paid.append(trade_code)
+            else:
+                state.released.append(trade_code)
+        state.search_terms = [method.split()[0] for method in PAYMENT_METHODS] + DESCRIPTION_WORDS
+    engine.dispose()
+    return state
@@ -0,0 +1,327 @@
+"""
+Retention and time-partitioned archival of the logs table
+
+A periodic job moves log rows older than LOG_RETENTION_DAYS (and, with
+LOG_MAX_LIVE_ROWS, the oldest rows beyond that many) out of the live table
+into gzip-compressed JSON Lines files, one per month
+(LOG_ARCHIVE_DIR/logs-2026-09.jsonl.gz). Each batch is removed with
+DELETE ... RETURNING and appended to its partitions as a new gzip member,
+fsynced, before the delete commits: a crash can leave a row in both places
+but never in neither, and readers drop such duplicates (same id and
+timestamp). Archival is off until LOG_ARCHIVE_DIR is set. A manifest
+keeps every partition's row count, time range and deal id range, so a query
+only opens the partitions that can hold matching rows.
+
+query() answers log lookups from the live table and the archive as one
+result. Files rather than attached SQLite databases keep the archive
+compressed and work the same on PostgreSQL. Deleted rows free pages that
+SQLite reuses, so the database file stops growing rather than shrinking.
+"""
+
+import asyncio
+import gzip
+import io
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, delete
+
+from models import Log
+
+logger = logging.getLogger(__name__)
+
+LOG_RETENTION_DAYS = float(os.getenv("LOG_RETENTION_DAYS", "30"))  # 0 keeps rows live forever
+LOG_MAX_LIVE_ROWS = int(os.getenv("LOG_MAX_LIVE_ROWS", "0"))  # 0 = no row cap
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "")  # unset = no archival
+LOG_ARCHIVE_INTERVAL_SECONDS = float(os.getenv("LOG_ARCHIVE_INTERVAL_SECONDS", "3600"))
+LOG_ARCHIVE_BATCH_SIZE = int(os.getenv("LOG_ARCHIVE_BATCH_SIZE", "5000"))
+MANIFEST = "manifest.json"
+TIMESTAMP_AT = len('{"timestamp":"')  # archive lines start with the row's timestamp
+LOG_COLUMNS = tuple(Log.__table__.c)
+
+def row_cap_query(max_live_rows: int):
+    """Timestamp of the oldest row that fits under the live row cap"""
+    return select(Log.timestamp).order_by(Log.timestamp.desc()).offset(max_live_rows - 1).limit(1)
+
+def archive_statement(cutoff: datetime, batch_size: int):
+    """DELETE ... RETURNING of the batch_size oldest rows before the cutoff"""
+    oldest = select(Log.id).where(Log.timestamp < cutoff).order_by(Log.timestamp).limit(batch_size)
+    return (
+        delete(Log)
+        .where(Log.id.in_(oldest))
+        .returning(*LOG_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+
+def live_logs_query(deal_id: Optional[int] = None, since: Optional[datetime] = None,
+                    until: Optional[datetime] = None, action: Optional[str] = None, limit: int = 1000):
+    """Matching rows of the live table, oldest first"""
+    conditions = []
+    if deal_id is not None:
+        conditions.append(Log.deal_id == deal_id)
+    if since is not None:
+        conditions.append(Log.timestamp >= since)
+    if until is not None:
+        conditions.append(Log.timestamp < until)
+    if action is not None:
+        conditions.append(Log.action == action)
+    return select(*LOG_COLUMNS).where(*conditions).order_by(Log.timestamp, Log.id).limit(limit)
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Log timestamps are stored as naive UTC"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def partition_name(timestamp: datetime) -> str:
+    return f"logs-{timestamp:%Y-%m}.jsonl.gz"
+
+def encode_row(row: dict) -> str:
+    # Timestamp first, so a scan can range-check a line before parsing it
+    line = {"timestamp": row["timestamp"].isoformat()}
+    line.update((key, value) for key, value in row.items() if key != "timestamp")
+    return json.dumps(line, separators=(",", ":")) + "\n"
+
+def decode_row(line: bytes) -> dict:
+    row = json.loads(line)
+    row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+    return row
+
+class LogArchive:
+    """Moves old log rows to monthly archive files and reads them back"""
+
+    def __init__(self, directory: str = LOG_ARCHIVE_DIR,
+                 retention_days: float = LOG_RETENTION_DAYS,
+                 max_live_rows: int = LOG_MAX_LIVE_ROWS,
+                 interval: float = LOG_ARCHIVE_INTERVAL_SECONDS,
+                 batch_size: int = LOG_ARCHIVE_BATCH_SIZE):
+        self.directory = directory
+        self.retention_days = retention_days
+        self.max_live_rows = max_live_rows
+        self.interval = interval
+        self.batch_size = batch_size
+        self.session_factory = None
+        self._task: Optional[asyncio.Task] = None
+        # name -> {"rows", "bytes", "first", "last", "min_deal_id", "max_deal_id"}
+        self.partitions: Dict[str, dict] = {}
+        # Metrics
+        self.runs = 0
+        self.total_archived = 0
+        self.last_archived = 0
+        self.last_run_ms = 0.0
+        self.last_run_at: Optional[datetime] = None
+        self.last_cutoff: Optional[datetime] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory) and (self.retention_days > 0 or self.max_live_rows > 0)
+
+    # Manifest
+    def load_manifest(self):
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.partitions = json.load(f)
+
+    def save_manifest(self, partitions: Dict[str, dict]):
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(partitions, f, indent=1, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    # Archiving
+    def append(self, rows: List[dict]):
+        """Append rows to their monthly partitions and record them in the manifest"""
+        by_partition: Dict[str, List[dict]] = {}
+        for row in rows:
+            by_partition.setdefault(partition_name(row["timestamp"]), []).append(row)
+        os.makedirs(self.directory, exist_ok=True)
+        # Runs in a worker thread: update a copy and swap it in, so readers see
+        # either manifest whole
+        partitions = {name: dict(entry) for name, entry in self.partitions.items()}
+        for name, part in sorted(by_partition.items()):
+            data = gzip.compress("".join(encode_row(row) for row in part).encode())
+            with open(os.path.join(self.directory, name), "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            times = [row["timestamp"].isoformat() for row in part]
+            deal_ids = [row["deal_id"] for row in part if row["deal_id"] is not None]
+            entry = partitions.setdefault(name, {
+                "rows": 0, "bytes": 0, "first": min(times), "last": max(times),
+                "min_deal_id": None, "max_deal_id": None
+            })
+            entry["rows"] += len(part)
+            # Readers stop at "bytes", so they never see a half-written member
+            entry["bytes"] = size
+            entry["first"] = min(entry["first"], min(times))
+            entry["last"] = max(entry["last"], max(times))
+            if deal_ids:
+                low, high = min(deal_ids), max(deal_ids)
+                if entry["min_deal_id"] is None or low < entry["min_deal_id"]:
+                    entry["min_deal_id"] = low
+                if entry["max_deal_id"] is None or high > entry["max_deal_id"]:
+                    entry["max_deal_id"] = high
+        self.save_manifest(partitions)
+        self.partitions = partitions
+
+    async def cutoff(self, db, now: datetime) -> Optional[datetime]:
+        """Rows older than this leave the live table"""
+        cutoff = now - timedelta(days=self.retention_days) if self.retention_days > 0 else None
+        if self.max_live_rows > 0:
+            oldest_kept = await db.scalar(row_cap_query(self.max_live_rows))
+            if oldest_kept is not None and (cutoff is None or oldest_kept > cutoff):
+                cutoff = oldest_kept
+        return cutoff
+
+    async def archive_batch(self, db, cutoff: datetime) -> int:
+        """Move up to batch_size of the oldest rows before the cutoff; commit afterwards"""
+        rows = (await db.execute(archive_statement(cutoff, self.batch_size))).all()
+        if rows:
+            await asyncio.to_thread(self.append, [row._asdict() for row in rows])
+        return len(rows)
+
+    async def sweep(self) -> int:
+        """Archive every row past retention, one transaction per batch"""
+        start = time.perf_counter()
+        now = datetime.utcnow()
+        archived = 0
+        async with self.session_factory() as db:
+            cutoff = await self.cutoff(db, now)
+        if cutoff is not None:
+            while True:
+                async with self.session_factory() as db:
+                    count = await self.archive_batch(db, cutoff)
+                    await db.commit()
+                archived += count
+                if count < self.batch_size:
+                    break
+        self.runs += 1
+        self.last_archived = archived
+        self.total_archived += archived
+        self.last_run_ms = (time.perf_counter() - start) * 1000
+        self.last_run_at = now
+        self.last_cutoff = cutoff
+        return archived
+
+    async def run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Log archival failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self, session_factory):
+        """Load the manifest and start the periodic job (when retention is configured)"""
+        self.session_factory = session_factory
+        self.load_manifest()
+        if self.enabled:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # Reading
+    def partitions_for(self, deal_id: Optional[int], since: Optional[datetime],
+                       until: Optional[datetime]) -> List[str]:
+        """Partitions that can hold matching rows, oldest first"""
+        partitions = self.partitions
+        names = []
+        for name in sorted(partitions):
+            entry = partitions[name]
+            if since is not None and entry["last"] < since.isoformat():
+                continue
+            if until is not None and entry["first"] >= until.isoformat():
+                continue
+            if deal_id is not None and (entry["min_deal_id"] is None or
+                                        not entry["min_deal_id"] <= deal_id <= entry["max_deal_id"]):
+                continue
+            names.append(name)
+        return names
+
+    def read_lines(self, name: str) -> Iterable[bytes]:
+        with open(os.path.join(self.directory, name), "rb") as f:
+            data = f.read(self.partitions[name]["bytes"])
+        with gzip.GzipFile(fileobj=io.BytesIO(data)) as lines:
+            yield from lines
+
+    def scan(self, names: List[str], deal_id: Optional[int], since: Optional[datetime],
+             until: Optional[datetime], action: Optional[str], limit: int) -> List[dict]:
+        """Matching archived rows; stops after the partition that reaches the limit"""
+        # Cheap checks on the raw line first: most lines never need parsing
+        deal_marker = b'"deal_id":%d,' % deal_id if deal_id is not None else None
+        since_key = since.isoformat().encode() if since is not None else None
+        until_key = until.isoformat().encode() if until is not None else None
+        found = []
+        for name in names:
+            for line in self.read_lines(name):
+                if deal_marker is not None and deal_marker not in line:
+                    continue
+                if since_key is not None or until_key is not None:
+                    timestamp = line[TIMESTAMP_AT:line.index(b'"', TIMESTAMP_AT)]
+                    if ((since_key is not None and timestamp < since_key) or
+                            (until_key is not None and timestamp >= until_key)):
+                        continue
+                row = decode_row(line)
+                if ((deal_id is None or row["deal_id"] == deal_id) and
+                        (action is None or row["action"] == action) and
+                        (since is None or row["timestamp"] >= since) and
+                        (until is None or row["timestamp"] < until)):
+                    found.append(row)
+            # Partitions are months, so every later one only holds later rows
+            if len(found) >= limit:
+                break
+        return found
+
+    async def query(self, db, deal_id: Optional[int] = None, since: Optional[datetime] = None,
+                    until: Optional[datetime] = None, action: Optional[str] = None,
+                    limit: int = 1000) -> List[dict]:
+        """Log rows from the live table and the archive, oldest first"""
+        since, until = naive_utc(since), naive_utc(until)
+        live = (await db.execute(live_logs_query(deal_id, since, until, action, limit))).all()
+        # Keyed by id and timestamp: a row archived twice is one row, but a
+        # database without AUTOINCREMENT may reuse the id of an archived row
+        rows = {(row.id, row.timestamp): row._asdict() for row in live}
+        names = self.partitions_for(deal_id, since, until)
+        if names:
+            archived = await asyncio.to_thread(self.scan, names, deal_id, since, until, action, limit)
+            for row in archived:
+                rows.setdefault((row["id"], row["timestamp"]), row)
+        return sorted(rows.values(), key=lambda row: (row["timestamp"] or datetime.min, row["id"]))[:limit]
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "retention_days": self.retention_days,
+            "max_live_rows": self.max_live_rows,
+            "runs": self.runs,
+            "total_archived": self.total_archived,
+            "last_archived": self.last_archived,
+            "last_run_ms": round(self.last_run_ms, 2),
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_cutoff": self.last_cutoff.isoformat() if self.last_cutoff else None,
+            "partitions": {
+                name: dict(entry) for name, entry in sorted(self.partitions.items())
+            },
+            "archived_rows": sum(entry["rows"] for entry in self.partitions.values()),
+            "archived_bytes": sum(entry["bytes"] for entry in self.partitions.values()),
+        }
+
+# Process-wide log archive
+log_archive = LogArchive()
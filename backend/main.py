@@ -2,23 +2,57 @@
 Main FastAPI application for P2P USDT Trading Platform
 """
 
-from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi import FastAPI, Body, Depends, Header, HTTPException, Query, Request, Response, WebSocket
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import ValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import select, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
+import asyncio
+import hmac
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+from decimal import Decimal
 import random
 
-from database import get_db, init_database
+from database import (
+    get_db, get_read_db, init_database, async_engine, async_read_engine, AsyncSessionLocal,
+    AsyncReadSessionLocal
+)
+from pagination import decode_cursor, cursor_values, split_page
+from orderbook import order_book
+from cache import listings_cache
+from trade_codes import decode_trade_code
+from serializers import item_json, page_json, page_from_rows
+from search import search_queries
+from queries import (
+    LISTING_SORTS, DEAL_SORTS, listing_load_options, deal_load_options, count_query, page_query,
+    listings_query, active_listings, listings_by_id, deals_query, trade_code_filter,
+    deal_by_trade_code, transition_statement, user_by_username, user_by_telegram_id, existing_users
+)
+from audit import audit_log
+from expiry import deal_expiry
+from log_archive import log_archive
+from stats import platform_stats
+from metrics import METRICS_ENABLED, MetricsMiddleware, request_metrics
+from slow_queries import slow_query_log
+from idempotency import IdempotencyMiddleware, idempotency_keys
+from rate_limit import RATE_LIMIT_ENABLED, RateLimitMiddleware
+from deal_events import FINAL_STATUSES, KEEPALIVE, deal_events
+from matching import MATCHING_MODE, Order, matching_engine
 from models import User, Listing, Deal, Log
 from schemas import (
     ListingCreate, ListingResponse, ListingUpdate, ListingsResponse,
     DealCreate, DealResponse, DealUpdate, DealsResponse,
     UserCreate, UserResponse,
+    BulkItemResult, BulkResponse,
+    PriceLevel, OrderBookSide, OrderBookResponse,
+    MarketSummary, MarketSummaryResponse, MarketDepth, MarketDepthResponse,
     APIResponse, AdminReleaseRequest, ConfirmPaymentRequest,
-    LogCreate
+    LogCreate, LogsResponse
 )
 
 # Load environment variables
@@ -31,6 +65,13 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Idempotency-Key handling for retried POSTs (inside CORS so replays get its headers)
+app.add_middleware(IdempotencyMiddleware)
+
+# Per-client rate limiting, checked before idempotency lookups touch the database
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -40,44 +81,220 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request/SQL metrics (GET /metrics)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    request_metrics.instrument(async_engine)
+    request_metrics.instrument(async_read_engine)
+
 # Configuration
 ESCROW_WALLET = os.getenv("ESCROW_WALLET_ADDRESS", "TXxxxxxx")
 COMMISSION_PERCENT = float(os.getenv("COMMISSION_PERCENT", "1.5"))
 RELEASE_SECRET = os.getenv("RELEASE_SECRET", "secure_key_here")
 TELEGRAM_ADMIN_ID = os.getenv("TELEGRAM_ADMIN_ID", "123456789")
+MAX_BULK_ITEMS = int(os.getenv("MAX_BULK_ITEMS", "500"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
 
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
-    init_database()
+    await init_database()
+    await load_order_book()
+    audit_log.start(AsyncSessionLocal)
+    deal_expiry.start(AsyncSessionLocal)
+    log_archive.start(AsyncSessionLocal)
+    await platform_stats.start(AsyncSessionLocal)
+    idempotency_keys.start(AsyncSessionLocal)
+    deal_events.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await deal_events.stop()
+    await idempotency_keys.stop()
+    await platform_stats.stop()
+    await log_archive.stop()
+    await deal_expiry.stop()
+    await audit_log.stop()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
 
 # Helper functions
-def log_action(db: Session, action: str, deal_id: int = None, user_id: int = None, 
+def log_action(db: AsyncSession, action: str, deal_id: int = None, user_id: int = None,
                notes: str = None, request: Request = None):
-    """Log an action to the database"""
-    log_entry = Log(
-        deal_id=deal_id,
-        user_id=user_id,
-        action=action,
-        notes=notes,
-        ip_address=request.client.host if request else None,
-        user_agent=request.headers.get("user-agent") if request else None
-    )
-    db.add(log_entry)
-    db.commit()
+    """Log an action; call before the commit of the change being logged"""
+    audit_log.record(db, {
+        "deal_id": deal_id,
+        "user_id": user_id,
+        "action": action,
+        "notes": notes,
+        "ip_address": request.client.host if request else None,
+        "user_agent": request.headers.get("user-agent") if request else None,
+        "timestamp": datetime.utcnow()
+    })
+
+def require_admin(x_release_secret: Optional[str] = Header(None)):
+    """Dependency for admin reads: the X-Release-Secret header must match RELEASE_SECRET"""
+    if x_release_secret is None or not hmac.compare_digest(x_release_secret.encode(), RELEASE_SECRET.encode()):
+        raise HTTPException(status_code=403, detail="Invalid release secret")
+
+async def transition_deal(db: AsyncSession, trade_code: str, from_statuses, to_status: str,
+                          *conditions, returning=()):
+    """Move a deal to to_status with a guarded UPDATE ... RETURNING
 
-def generate_unique_trade_code(db: Session) -> str:
-    """Generate a unique trade code"""
-    while True:
-        code = Deal.generate_trade_code()
-        existing = db.query(Deal).filter(Deal.trade_code == code).first()
-        if not existing:
-            return code
+    The status check and the write are one statement, so of concurrent callers
+    exactly one matches the guard. Candidate statuses are tried in order (one
+    statement in the common case) so the caller learns which one the deal left.
+    Returns (previous_status, row of id, trade_code, *returning) or None.
+    """
+    for previous in from_statuses:
+        row = (await db.execute(
+            transition_statement(trade_code, previous, to_status, *conditions, returning=returning)
+        )).first()
+        if row:
+            return previous, row
+    return None
 
 def calculate_commission(amount: float) -> float:
     """Calculate commission amount"""
     return amount * (COMMISSION_PERCENT / 100)
 
+async def load_order_book():
+    """Build the in-memory order book from the active listings"""
+    async with AsyncSessionLocal() as db:
+        listings = (await db.scalars(active_listings())).all()
+    order_book.load(listings)
+    if MATCHING_MODE != "off":
+        matching_engine.load(Order.from_listing(listing) for listing in listings)
+
+async def sync_listing(db: AsyncSession, listing_id: int):
+    """Reload a committed listing with its user and apply it to the order book"""
+    await sync_listings(db, [listing_id])
+
+async def sync_listings(db: AsyncSession, listing_ids: List[int]):
+    """Reload committed listings in one SELECT and apply them to the order book"""
+    listings = (await db.scalars(listings_by_id(listing_ids))).all()
+    found = set()
+    for listing in listings:
+        order_book.upsert(listing)
+        found.add(listing.id)
+        if MATCHING_MODE != "off":
+            if listing.status == "active":
+                matching_engine.upsert(Order.from_listing(listing))
+            else:
+                matching_engine.remove(listing.id)
+    for listing_id in set(listing_ids) - found:
+        order_book.remove(listing_id)
+        matching_engine.remove(listing_id)
+
+def match_view(fill) -> Dict[str, Any]:
+    return {
+        "listing_id": fill.maker_id,
+        "buyer_id": fill.buyer_id,
+        "seller_id": fill.seller_id,
+        "rate": str(fill.rate),
+        "usdt_amount": str(fill.amount),
+        "etb_amount": str(fill.etb_amount),
+    }
+
+async def create_matched_deals(db: AsyncSession, taker: Order, fills, request: Request) -> List[Deal]:
+    """Persist the engine's fills as pending deals, with listing amounts following the engine"""
+    deals = []
+    for fill in fills:
+        deal = Deal(
+            listing_id=fill.maker_id,
+            buyer_id=fill.buyer_id,
+            seller_id=fill.seller_id,
+            usdt_amount=fill.amount,
+            etb_amount=fill.etb_amount,
+            payment_method=fill.payment_method,
+            trade_code=Deal.placeholder_trade_code(),
+            escrow_wallet=ESCROW_WALLET,
+            commission_amount=calculate_commission(float(fill.amount))
+        )
+        deal.set_expiry()
+        db.add(deal)
+        deals.append(deal)
+    await db.flush()
+    
+    for deal, fill in zip(deals, fills):
+        deal.trade_code = Deal.generate_trade_code(deal.id)
+        log_action(db, "deal_matched", deal_id=deal.id,
+                   notes=f"Matched listing {fill.taker_id} with listing {fill.maker_id}: "
+                         f"{fill.amount} USDT at {fill.rate}",
+                   request=request)
+    
+    # Listings still on the book carry their remaining amount. Ones the engine
+    # has filled (or left below their minimum) are completed and keep their last
+    # amount, which stays positive for ListingResponse
+    remaining = {fill.maker_id: fill.maker_remaining for fill in fills}
+    remaining[taker.id] = taker.amount
+    for listing_id, amount in remaining.items():
+        if listing_id in matching_engine.orders:
+            values = {"amount": amount}
+        else:
+            values = {"status": "completed"}
+        await db.execute(
+            update(Listing).where(Listing.id == listing_id).values(**values)
+            .execution_options(synchronize_session=False)
+        )
+    
+    await db.commit()
+    platform_stats.deal_created(len(deals))
+    return deals
+
+async def match_listing(db: AsyncSession, listing: Listing, request: Request) -> Dict[str, Any]:
+    """Run a newly created listing through the matching engine (MATCHING_MODE propose/auto)"""
+    taker = Order.from_listing(listing)
+    if MATCHING_MODE == "propose":
+        fills = matching_engine.match(taker, commit=False)
+        await sync_listing(db, listing.id)
+        return {"matches": [match_view(fill) for fill in fills]}
+    
+    fills = matching_engine.match(taker)
+    deals = []
+    if fills:
+        try:
+            deals = await create_matched_deals(db, taker, fills, request)
+        except Exception:
+            # The engine already consumed the liquidity; rebuild it from the database
+            await db.rollback()
+            await load_order_book()
+            raise
+    await sync_listings(db, [listing.id, *(fill.maker_id for fill in fills)])
+    return {
+        "deals": [
+            {**match_view(fill), "deal_id": deal.id, "trade_code": deal.trade_code}
+            for deal, fill in zip(deals, fills)
+        ],
+        "remaining_amount": str(taker.amount),
+    }
+
+def validate_bulk_items(items: List[Dict[str, Any]], schema):
+    """Validate each bulk item on its own; returns (valid (index, model) pairs, results)"""
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items per request")
+    valid, results = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+            results.append(BulkItemResult(index=index))
+        except ValidationError as e:
+            error = "; ".join(
+                f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+            )
+            results.append(BulkItemResult(index=index, error=error))
+    return valid, results
+
+def bulk_response(kind: str, results: List[BulkItemResult]) -> BulkResponse:
+    created = sum(1 for result in results if result.id is not None)
+    return BulkResponse(
+        success=created == len(results),
+        message=f"Created {created} of {len(results)} {kind}",
+        created=created,
+        results=results
+    )
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -88,57 +305,190 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Request latency, status and SQL counters per route, in Prometheus text format"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=request_metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Listings endpoints
 @app.get("/listings", response_model=ListingsResponse)
 async def get_listings(
+    request: Request,
     type: Optional[str] = None,
     status: str = "active",
-    limit: int = 50,
-    offset: int = 0,
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    sort: str = Query("created_at", pattern="^(created_at|rate)$"),
+    cursor: Optional[str] = None,
+    with_total: bool = True,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get all listings with optional filtering"""
-    query = db.query(Listing).filter(Listing.status == status)
+    """Get all listings with optional filtering, by offset or by keyset cursor"""
+    # Serialized pages are cached per filter set until the next listing/deal write
+    version = listings_cache.version
+    etag = listings_cache.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
     
-    if type and type in ["buy", "sell"]:
-        query = query.filter(Listing.type == type)
+    key = (type, status, limit, offset, sort, cursor, with_total)
+    body = listings_cache.get(key)
+    if body is None:
+        body = await query_listings(db, type, status, limit, offset, sort, cursor, with_total)
+        # A write during the query may have made this body stale; don't cache it
+        # under the newer version
+        if listings_cache.version == version:
+            listings_cache.put(key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def query_listings(db: AsyncSession, type: Optional[str], status: str, limit: int,
+                         offset: int, sort: str, cursor: Optional[str],
+                         with_total: bool) -> bytes:
+    """Serialized ListingsResponse page, from the order book or from SQL"""
+    sort_columns = LISTING_SORTS.get(sort)
+    if not sort_columns:
+        raise HTTPException(status_code=400, detail="Invalid sort order")
     
-    total = query.count()
-    listings = query.offset(offset).limit(limit).all()
+    if type not in ["buy", "sell"]:
+        type = None
     
-    return ListingsResponse(
-        success=True,
-        data=listings,
-        total=total
+    # Active listings are served from the in-memory order book
+    if status == "active" and order_book.ready:
+        after = cursor_values(sort_columns, decode_cursor(cursor, sort)) if cursor else None
+        rows = order_book.rows(type, sort, after, 0 if cursor else offset, limit + 1)
+        listings, next_cursor = split_page(rows, limit, sort, sort_columns)
+        return page_json(
+            [order_book.listing_json[listing.id] for listing in listings],
+            order_book.count(type) if with_total else None,
+            next_cursor
+        )
+    
+    query = listings_query(status, type)
+    total = None
+    if with_total:
+        total = await db.scalar(count_query(query))
+    
+    after = decode_cursor(cursor, sort) if cursor else None
+    rows = (await db.scalars(
+        page_query(query.options(*listing_load_options()), sort_columns, after, offset, limit + 1)
+    )).all()
+    listings, next_cursor = split_page(rows, limit, sort, sort_columns)
+    
+    return page_from_rows(listings, ListingResponse, total, next_cursor)
+
+@app.get("/listings/search", response_model=ListingsResponse)
+async def search_listings(
+    q: str,
+    type: Optional[str] = None,
+    status: str = "active",
+    limit: int = 20,
+    offset: int = 0,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Ranked full-text search over listing description, payment method and contact"""
+    limit = max(1, min(limit, 100))
+    matching, ranked = search_queries(q, db.bind.dialect.name, type, status)
+    total = await db.scalar(count_query(matching))
+    rows = (await db.scalars(
+        ranked.options(*listing_load_options()).offset(offset).limit(limit)
+    )).all()
+    return Response(
+        content=page_from_rows(rows, ListingResponse, total, None),
+        media_type="application/json"
     )
 
 @app.post("/listings", response_model=APIResponse)
 async def create_listing(
     listing: ListingCreate,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new listing"""
     # Validate user exists
-    user = db.query(User).filter(User.id == listing.user_id).first()
+    user = await db.get(User, listing.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Create listing
     db_listing = Listing(**listing.dict())
     db.add(db_listing)
-    db.commit()
-    db.refresh(db_listing)
     
     # Log action
     log_action(db, "listing_created", user_id=listing.user_id, 
                notes=f"Created {listing.type} listing for {listing.amount} USDT", 
                request=request)
     
+    await db.commit()
+    await db.refresh(db_listing)
+    if MATCHING_MODE == "off":
+        matched = {}
+        await sync_listing(db, db_listing.id)
+    else:
+        # Also syncs every listing it traded against
+        matched = await match_listing(db, db_listing, request)
+    listings_cache.bump()
+    
     return APIResponse(
         success=True,
         message="Listing created successfully",
-        data={"listing_id": db_listing.id}
+        data={"listing_id": db_listing.id, **matched}
+    )
+
+@app.post("/listings/bulk", response_model=BulkResponse)
+async def create_listings_bulk(
+    request: Request,
+    items: List[Dict[str, Any]] = Body(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """Create many listings in one transaction, reporting errors per item"""
+    valid, results = validate_bulk_items(items, ListingCreate)
+    
+    # Validate users exist (one query for the whole batch)
+    user_ids = {listing.user_id for _, listing in valid}
+    known = set((await db.scalars(select(User.id).where(User.id.in_(user_ids)))).all()) if user_ids else set()
+    rows = []
+    for index, listing in valid:
+        if listing.user_id in known:
+            rows.append((index, listing))
+        else:
+            results[index].error = "User not found"
+    
+    if rows:
+        ids = (await db.scalars(
+            insert(Listing).returning(Listing.id, sort_by_parameter_order=True),
+            [listing.dict() for _, listing in rows]
+        )).all()
+        for (index, listing), listing_id in zip(rows, ids):
+            results[index].id = listing_id
+            log_action(db, "listing_created", user_id=listing.user_id,
+                       notes=f"Created {listing.type} listing for {listing.amount} USDT (bulk)",
+                       request=request)
+        await db.commit()
+        if MATCHING_MODE == "auto":
+            # Matched one at a time in array order, exactly as if posted one by one
+            for listing in sorted((await db.scalars(listings_by_id(ids))).all(), key=lambda l: l.id):
+                await match_listing(db, listing, request)
+        else:
+            await sync_listings(db, ids)
+        listings_cache.bump()
+    
+    return bulk_response("listings", results)
+
+@app.get("/listings/{listing_id}/matches", response_model=APIResponse)
+async def get_listing_matches(listing_id: int):
+    """Listings an active listing would trade against right now, in price-time priority"""
+    if MATCHING_MODE == "off":
+        raise HTTPException(status_code=404, detail="Matching is disabled")
+    order = matching_engine.orders.get(listing_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Listing is not on the book")
+    fills = matching_engine.match(order, commit=False)
+    return APIResponse(
+        success=True,
+        message=f"{len(fills)} matching listings",
+        data={"matches": [match_view(fill) for fill in fills]}
     )
 
 @app.put("/listings/{listing_id}", response_model=APIResponse)
@@ -146,10 +496,10 @@ async def update_listing(
     listing_id: int,
     listing_update: ListingUpdate,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a listing"""
-    db_listing = db.query(Listing).filter(Listing.id == listing_id).first()
+    db_listing = await db.get(Listing, listing_id)
     if not db_listing:
         raise HTTPException(status_code=404, detail="Listing not found")
     
@@ -157,60 +507,170 @@ async def update_listing(
     for field, value in listing_update.dict(exclude_unset=True).items():
         setattr(db_listing, field, value)
     
-    db.commit()
-    
     # Log action
     log_action(db, "listing_updated", user_id=db_listing.user_id,
                notes=f"Updated listing {listing_id}", request=request)
     
-    return APIResponse(success=True, message="Listing updated successfully")
+    await db.commit()
+    matched = None
+    if (MATCHING_MODE == "auto" and db_listing.status == "active"
+            and not matching_engine.keeps_priority(Order.from_listing(db_listing))):
+        # Repriced (or reactivated) listings may now cross the book: match them like new ones
+        matched = await match_listing(db, db_listing, request)
+    else:
+        await sync_listing(db, listing_id)
+    listings_cache.bump()
+    
+    return APIResponse(success=True, message="Listing updated successfully", data=matched)
+
+# Statistics
+@app.get("/stats", response_model=APIResponse)
+async def get_stats():
+    """Platform statistics from incrementally maintained counters"""
+    return APIResponse(
+        success=True,
+        message="Statistics retrieved successfully",
+        data=platform_stats.snapshot(order_book)
+    )
+
+# Order book endpoints
+def book_side_view(book_side, depth: int) -> OrderBookSide:
+    """Best rate and depth ladder of one side of the order book"""
+    return OrderBookSide(
+        best_rate=book_side.best_rate(),
+        levels=[
+            PriceLevel(rate=rate, amount=amount, count=count)
+            for rate, amount, count in book_side.depth(depth)
+        ]
+    )
+
+@app.get("/orderbook", response_model=OrderBookResponse)
+async def get_order_book(depth: int = Query(10, ge=1, le=100)):
+    """Best rate and aggregated depth ladder per side"""
+    return OrderBookResponse(
+        success=True,
+        buy=book_side_view(order_book.sides["buy"], depth),
+        sell=book_side_view(order_book.sides["sell"], depth)
+    )
+
+@app.get("/orderbook/top", response_model=ListingsResponse)
+async def get_top_listings(type: str, limit: int = Query(10, ge=1, le=100)):
+    """Top N active listings of a side in price-time priority"""
+    if type not in ["buy", "sell"]:
+        raise HTTPException(status_code=400, detail="Type must be 'buy' or 'sell'")
+    body = page_json(
+        [order_book.listing_json[listing.id] for listing in order_book.top(type, limit)],
+        order_book.count(type),
+        None
+    )
+    return Response(content=body, media_type="application/json")
+
+# Market endpoints (per payment method, served from the order book)
+@app.get("/market/summary", response_model=MarketSummaryResponse)
+async def get_market_summary():
+    """Best bid/ask, spread and total size per payment method"""
+    summaries = []
+    for payment_method in sorted(order_book.markets):
+        bids, asks = order_book.markets[payment_method]["buy"], order_book.markets[payment_method]["sell"]
+        best_bid, best_ask = bids.best_rate(), asks.best_rate()
+        summaries.append(MarketSummary(
+            payment_method=payment_method,
+            best_bid=best_bid,
+            best_ask=best_ask,
+            spread=best_ask - best_bid if best_bid is not None and best_ask is not None else None,
+            bid_count=len(bids),
+            ask_count=len(asks),
+            bid_amount=bids.amount,
+            ask_amount=asks.amount
+        ))
+    return MarketSummaryResponse(success=True, data=summaries)
+
+@app.get("/market/depth", response_model=MarketDepthResponse)
+async def get_market_depth(payment_method: Optional[str] = None, levels: int = Query(10, ge=1, le=100)):
+    """Aggregated depth per price level for one or every payment method"""
+    if payment_method is not None:
+        if payment_method not in order_book.markets:
+            raise HTTPException(status_code=404, detail="No active listings for this payment method")
+        methods = [payment_method]
+    else:
+        methods = sorted(order_book.markets)
+    return MarketDepthResponse(success=True, data=[
+        MarketDepth(
+            payment_method=method,
+            buy=book_side_view(order_book.markets[method]["buy"], levels),
+            sell=book_side_view(order_book.markets[method]["sell"], levels)
+        )
+        for method in methods
+    ])
+
+@app.get("/quote", response_model=ListingsResponse)
+async def get_quote(side: str, amount: Decimal, payment_method: Optional[str] = None, limit: int = 10):
+    """Best-priced active listings that accept `amount` USDT in one deal
+
+    `side` is the quoting user's: buying is quoted from sell listings (lowest
+    rate first), selling from buy listings (highest rate first).
+    """
+    if side not in ["buy", "sell"]:
+        raise HTTPException(status_code=400, detail="Side must be 'buy' or 'sell'")
+    if amount <= 0:
+        raise HTTPException(status_code=400, detail="Amount must be positive")
+    listing_ids = order_book.quotes.quote(
+        "sell" if side == "buy" else "buy", float(amount), payment_method, max(1, min(limit, 100))
+    )
+    body = page_json([order_book.listing_json[i] for i in listing_ids], len(listing_ids), None)
+    return Response(content=body, media_type="application/json")
 
 # Deals endpoints
 @app.post("/deals", response_model=APIResponse)
 async def create_deal(
     deal: DealCreate,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new deal"""
     # Validate listing exists and is active
-    listing = db.query(Listing).filter(
+    listing = await db.scalar(select(Listing).where(
         Listing.id == deal.listing_id,
         Listing.status == "active"
-    ).first()
+    ))
     if not listing:
         raise HTTPException(status_code=404, detail="Active listing not found")
     
     # Validate users exist
-    buyer = db.query(User).filter(User.id == deal.buyer_id).first()
-    seller = db.query(User).filter(User.id == deal.seller_id).first()
+    buyer = await db.get(User, deal.buyer_id)
+    seller = await db.get(User, deal.seller_id)
     if not buyer or not seller:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Generate unique trade code
-    trade_code = generate_unique_trade_code(db)
-    
     # Calculate commission
     commission = calculate_commission(float(deal.usdt_amount))
     
     # Create deal
     db_deal = Deal(
         **deal.dict(),
-        trade_code=trade_code,
+        trade_code=Deal.placeholder_trade_code(),
         escrow_wallet=ESCROW_WALLET,
         commission_amount=commission
     )
     db_deal.set_expiry()  # Set 90-minute expiry
     
     db.add(db_deal)
-    db.commit()
-    db.refresh(db_deal)
+    await db.flush()
+    
+    # Derive the trade code from the id the insert just assigned
+    trade_code = Deal.generate_trade_code(db_deal.id)
+    db_deal.trade_code = trade_code
     
     # Log action
     log_action(db, "deal_created", deal_id=db_deal.id,
                notes=f"Created deal {trade_code} for {deal.usdt_amount} USDT",
                request=request)
     
+    await db.commit()
+    await db.refresh(db_deal)
+    listings_cache.bump()
+    platform_stats.deal_created()
+    
     return APIResponse(
         success=True,
         message="Deal created successfully",
@@ -223,46 +683,147 @@ async def create_deal(
     )
 
 @app.get("/deals/{trade_code}", response_model=DealResponse)
-async def get_deal(trade_code: str, db: Session = Depends(get_db)):
+async def get_deal(trade_code: str, db: AsyncSession = Depends(get_read_db)):
     """Get deal by trade code"""
-    deal = db.query(Deal).filter(Deal.trade_code == trade_code).first()
+    deal = await db.scalar(deal_by_trade_code(trade_code))
     if not deal:
         raise HTTPException(status_code=404, detail="Deal not found")
     
     return deal
 
+async def watch_deal(trade_code: str):
+    """Subscribe to a deal's events, then read its current state
+
+    Subscribing first means a transition committed while the snapshot is read
+    is still delivered. Returns (deal_id, queue, deal).
+    """
+    async with AsyncReadSessionLocal() as db:
+        deal_id = decode_trade_code(trade_code)
+        if deal_id is None:
+            # Legacy random codes need a lookup to find the id to subscribe to
+            deal_id = await db.scalar(select(Deal.id).where(Deal.trade_code == trade_code))
+            if deal_id is None:
+                raise HTTPException(status_code=404, detail="Deal not found")
+        queue = deal_events.subscribe(deal_id)
+        if queue is None:
+            raise HTTPException(status_code=503, detail="Too many live deal watchers, retry later")
+        try:
+            deal = await db.scalar(deal_by_trade_code(trade_code))
+        except BaseException:
+            deal_events.unsubscribe(deal_id, queue)
+            raise
+    if not deal:
+        deal_events.unsubscribe(deal_id, queue)
+        raise HTTPException(status_code=404, detail="Deal not found")
+    return deal_id, queue, deal
+
+@app.get("/deals/{trade_code}/events")
+async def stream_deal_events(trade_code: str):
+    """Server-Sent Events: the deal now, then each status change until it is final"""
+    deal_id, queue, deal = await watch_deal(trade_code)
+    snapshot = b"retry: 5000\nevent: deal\ndata: " + item_json(deal, DealResponse) + b"\n\n"
+    
+    async def events():
+        try:
+            yield snapshot
+            status = deal.status
+            while status not in FINAL_STATUSES:
+                event = await queue.get()
+                if event is None:
+                    return
+                if event is KEEPALIVE:
+                    yield b": keepalive\n\n"
+                    continue
+                status = event.status
+                yield event.sse
+        finally:
+            deal_events.unsubscribe(deal_id, queue)
+    
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also runs when the client disconnects before the stream starts
+        background=BackgroundTask(deal_events.unsubscribe, deal_id, queue)
+    )
+
+@app.websocket("/deals/{trade_code}/ws")
+async def deal_events_socket(websocket: WebSocket, trade_code: str):
+    """WebSocket variant of /deals/{trade_code}/events (JSON {"event", "data"} messages)"""
+    try:
+        deal_id, queue, deal = await watch_deal(trade_code)
+    except HTTPException as exc:
+        # 1008 policy violation for an unknown deal, 1013 try again later when full
+        await websocket.close(code=1008 if exc.status_code == 404 else 1013)
+        return
+    
+    async def send_events():
+        await websocket.send_text(
+            '{"event":"deal","data":' + item_json(deal, DealResponse).decode() + "}"
+        )
+        status = deal.status
+        while status not in FINAL_STATUSES:
+            event = await queue.get()
+            if event is None:
+                return
+            if event is KEEPALIVE:
+                # The server pings idle sockets itself
+                continue
+            status = event.status
+            await websocket.send_text(event.ws)
+    
+    async def until_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    
+    await websocket.accept()
+    sender = asyncio.ensure_future(send_events())
+    receiver = asyncio.ensure_future(until_disconnect())
+    try:
+        done, _ = await asyncio.wait((sender, receiver), return_when=asyncio.FIRST_COMPLETED)
+        if sender in done:
+            sender.result()
+            await websocket.close()
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        deal_events.unsubscribe(deal_id, queue)
+
 @app.post("/confirm-payment", response_model=APIResponse)
 async def confirm_payment(
     payment_request: ConfirmPaymentRequest,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Seller confirms ETB payment received"""
-    deal = db.query(Deal).filter(Deal.trade_code == payment_request.trade_code).first()
-    if not deal:
-        raise HTTPException(status_code=404, detail="Deal not found")
-    
-    # Validate user is the seller
-    if deal.seller_id != payment_request.user_id:
-        raise HTTPException(status_code=403, detail="Only seller can confirm payment")
-    
-    # Check if deal is in correct status
-    if deal.status not in ["pending", "escrowed"]:
+    transition = await transition_deal(
+        db, payment_request.trade_code, ("pending", "escrowed"), "paid",
+        Deal.seller_id == payment_request.user_id
+    )
+    if transition is None:
+        # Nothing matched the guard: report why
+        deal = (await db.execute(
+            select(Deal.seller_id).where(trade_code_filter(payment_request.trade_code))
+        )).first()
+        if not deal:
+            raise HTTPException(status_code=404, detail="Deal not found")
+        if deal.seller_id != payment_request.user_id:
+            raise HTTPException(status_code=403, detail="Only seller can confirm payment")
         raise HTTPException(status_code=400, detail="Deal cannot be confirmed in current status")
+    previous_status, deal = transition
     
-    # Update deal status
-    deal.status = "paid"
-    db.commit()
-    
-    # Log action
+    # Log action (committed with the transition, see AUDIT_SYNC_ACTIONS)
     log_action(db, "payment_confirmed", deal_id=deal.id, user_id=payment_request.user_id,
                notes=payment_request.notes or "Seller confirmed ETB payment received",
                request=request)
     
+    await db.commit()
+    platform_stats.deal_transition(previous_status, "paid")
+    deal_events.publish(deal.id, deal.trade_code, "paid", previous_status)
+    
     return APIResponse(
         success=True,
         message="Payment confirmed successfully",
-        data={"trade_code": deal.trade_code, "status": deal.status}
+        data={"trade_code": deal.trade_code, "status": "paid"}
     )
 
 # Admin endpoints
@@ -270,30 +831,34 @@ async def confirm_payment(
 async def release_funds(
     release_request: AdminReleaseRequest,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Admin releases USDT funds"""
     # Validate release secret
     if release_request.release_secret != RELEASE_SECRET:
         raise HTTPException(status_code=403, detail="Invalid release secret")
     
-    deal = db.query(Deal).filter(Deal.trade_code == release_request.trade_code).first()
-    if not deal:
-        raise HTTPException(status_code=404, detail="Deal not found")
-    
-    # Check if deal is in correct status
-    if deal.status != "paid":
+    transition = await transition_deal(
+        db, release_request.trade_code, ("paid",), "released",
+        returning=(Deal.usdt_amount, Deal.commission_amount)
+    )
+    if transition is None:
+        exists = await db.scalar(select(Deal.id).where(trade_code_filter(release_request.trade_code)))
+        if not exists:
+            raise HTTPException(status_code=404, detail="Deal not found")
         raise HTTPException(status_code=400, detail="Deal must be in 'paid' status to release funds")
+    _, deal = transition
     
-    # Update deal status
-    deal.status = "released"
-    db.commit()
-    
-    # Log action
+    # Log action (committed with the release, see AUDIT_SYNC_ACTIONS)
     log_action(db, "funds_released", deal_id=deal.id,
                notes=release_request.notes or f"Admin released {deal.usdt_amount} USDT to buyer",
                request=request)
     
+    await db.commit()
+    platform_stats.deal_transition("paid", "released", usdt_amount=deal.usdt_amount,
+                                   commission=deal.commission_amount)
+    deal_events.publish(deal.id, deal.trade_code, "released", "paid")
+    
     return APIResponse(
         success=True,
         message="Funds released successfully",
@@ -307,35 +872,99 @@ async def release_funds(
 @app.get("/admin/pending-deals", response_model=DealsResponse)
 async def get_pending_deals(
     status: str = "paid",
-    limit: int = 50,
-    offset: int = 0,
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    with_total: bool = True,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get pending deals for admin review"""
-    query = db.query(Deal).filter(Deal.status == status)
-    total = query.count()
-    deals = query.offset(offset).limit(limit).all()
+    """Get pending deals for admin review, by offset or by keyset cursor"""
+    sort_columns = DEAL_SORTS["created_at"]
+    query = deals_query(status)
     
-    return DealsResponse(
+    total = None
+    if with_total:
+        total = await db.scalar(count_query(query))
+    
+    after = decode_cursor(cursor, "created_at") if cursor else None
+    rows = (await db.scalars(
+        page_query(query.options(*deal_load_options()), sort_columns, after, offset, limit + 1)
+    )).all()
+    deals, next_cursor = split_page(rows, limit, "created_at", sort_columns)
+    
+    return Response(
+        content=page_from_rows(deals, DealResponse, total, next_cursor),
+        media_type="application/json"
+    )
+
+@app.get("/admin/expiry", response_model=APIResponse)
+async def get_expiry_status():
+    """Deal-expiry sweep metrics"""
+    return APIResponse(
+        success=True,
+        message="Expiry metrics retrieved successfully",
+        data=deal_expiry.metrics()
+    )
+
+@app.get("/admin/slow-queries", response_model=APIResponse, dependencies=[Depends(require_admin)])
+async def get_slow_queries(limit: int = Query(10, ge=1, le=100), sort: str = "total"):
+    """Top SQL statement fingerprints by time, with plans for the slow ones"""
+    if sort not in ("total", "max", "mean", "count", "slow"):
+        raise HTTPException(status_code=400, detail="Invalid sort order")
+    return APIResponse(
+        success=True,
+        message="Slow queries retrieved successfully",
+        data={
+            "enabled": slow_query_log.enabled,
+            "threshold_ms": slow_query_log.threshold * 1000,
+            "queries": slow_query_log.top(limit, sort),
+            "recent": list(slow_query_log.recent)[-limit:][::-1]
+        }
+    )
+
+@app.get("/admin/logs", response_model=LogsResponse, dependencies=[Depends(require_admin)])
+async def search_logs(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    action: Optional[str] = None,
+    deal_id: Optional[int] = None,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Log rows in a time range, live and archived alike, oldest first"""
+    rows = await log_archive.query(db, deal_id, since, until, action, max(1, min(limit, 1000)))
+    return LogsResponse(success=True, data=rows)
+
+@app.get("/admin/log-archive", response_model=APIResponse, dependencies=[Depends(require_admin)])
+async def get_log_archive_status():
+    """Log retention settings, archival metrics and the archive partitions"""
+    return APIResponse(
         success=True,
-        data=deals,
-        total=total
+        message="Log archive status retrieved successfully",
+        data=log_archive.metrics()
     )
 
+# Logs endpoints
+@app.get("/logs/{deal_id}", response_model=LogsResponse)
+async def get_deal_logs(deal_id: int, db: AsyncSession = Depends(get_read_db)):
+    """A deal's audit trail, oldest first, including archived rows"""
+    rows = await log_archive.query(db, deal_id=deal_id)
+    return LogsResponse(success=True, data=rows)
+
 # Users endpoints
 @app.post("/users", response_model=APIResponse)
 async def create_user(
     user: UserCreate,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new user"""
     # Check if user already exists
     existing_user = None
     if user.telegram_username:
-        existing_user = db.query(User).filter(User.telegram_username == user.telegram_username).first()
+        existing_user = await db.scalar(user_by_username(user.telegram_username))
     if not existing_user and user.telegram_id:
-        existing_user = db.query(User).filter(User.telegram_id == user.telegram_id).first()
+        existing_user = await db.scalar(user_by_telegram_id(user.telegram_id))
     
     if existing_user:
         raise HTTPException(status_code=400, detail="User already exists")
@@ -343,23 +972,70 @@ async def create_user(
     # Create user
     db_user = User(**user.dict())
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.flush()
     
     # Log action
     log_action(db, "user_created", user_id=db_user.id,
                notes=f"Created user {user.name}", request=request)
     
+    await db.commit()
+    await db.refresh(db_user)
+    
     return APIResponse(
         success=True,
         message="User created successfully",
         data={"user_id": db_user.id}
     )
 
+@app.post("/users/bulk", response_model=BulkResponse)
+async def create_users_bulk(
+    request: Request,
+    items: List[Dict[str, Any]] = Body(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """Create many users in one transaction, reporting errors per item"""
+    valid, results = validate_bulk_items(items, UserCreate)
+    
+    # Check for existing users (one query for the whole batch)
+    usernames = {user.telegram_username for _, user in valid if user.telegram_username}
+    telegram_ids = {user.telegram_id for _, user in valid if user.telegram_id}
+    taken_usernames, taken_ids = set(), set()
+    if usernames or telegram_ids:
+        existing = (await db.execute(existing_users(usernames, telegram_ids))).all()
+        # A row matched on one column may have NULL in the other; NULL never conflicts
+        taken_usernames = {username for username, _ in existing if username is not None}
+        taken_ids = {telegram_id for _, telegram_id in existing if telegram_id is not None}
+    
+    rows = []
+    for index, user in valid:
+        if ((user.telegram_username is not None and user.telegram_username in taken_usernames) or
+                (user.telegram_id is not None and user.telegram_id in taken_ids)):
+            results[index].error = "User already exists"
+            continue
+        # Later duplicates inside the same batch are rejected too
+        if user.telegram_username is not None:
+            taken_usernames.add(user.telegram_username)
+        if user.telegram_id is not None:
+            taken_ids.add(user.telegram_id)
+        rows.append((index, user))
+    
+    if rows:
+        ids = (await db.scalars(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [user.dict() for _, user in rows]
+        )).all()
+        for (index, user), user_id in zip(rows, ids):
+            results[index].id = user_id
+            log_action(db, "user_created", user_id=user_id,
+                       notes=f"Created user {user.name} (bulk)", request=request)
+        await db.commit()
+    
+    return bulk_response("users", results)
+
 @app.get("/users/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get user by ID"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
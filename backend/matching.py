@@ -0,0 +1,231 @@
+"""
+Price-time priority matching of buy and sell listings
+
+Opt-in with MATCHING_MODE: "propose" reports the listings a new listing
+could trade against, "auto" turns those matches into deals. Resting
+listings sit in one heap per (payment method, side), best price first and
+oldest (lowest id) first within a price, so finding the best counterparty
+is O(log n). A new listing walks the opposite heap while prices cross and
+trades against each resting listing, at the resting listing's rate, until
+one of the two is used up.
+
+A fill must fit both listings' per-deal limits: it is the smallest of the
+two remaining amounts and the two max_amounts, and must reach both
+min_amounts. A max_amount smaller than what both sides still have splits
+the trade into several fills (deals) against the same resting listing. Resting listings that cannot trade with the incoming one
+(limits, or the same user on both sides) are skipped and put back; at most
+MATCH_SCAN_LIMIT are skipped per incoming listing, so matching costs
+O((fills + skips) log n). A listing whose remaining amount drops below its
+own min_amount is done and leaves the book.
+
+The engine is plain in-memory state with no clock or randomness: the same
+listings in the same order always produce the same fills. Updates and
+cancellations are lazy (stale heap entries are dropped when they surface).
+"""
+
+import heapq
+import os
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+MATCHING_MODE = os.getenv("MATCHING_MODE", "off").lower()  # off, propose, auto
+MATCH_SCAN_LIMIT = int(os.getenv("MATCH_SCAN_LIMIT", "64"))
+ETB_QUANTUM = Decimal("0.01")
+ZERO = Decimal("0")
+
+def market_key(payment_method: str) -> str:
+    """Payment methods match ignoring case and spacing ("CBE  birr" == "CBE Birr")"""
+    return " ".join(payment_method.split()).casefold()
+
+class Order:
+    """What the engine knows about one listing"""
+
+    __slots__ = ("id", "side", "user_id", "rate", "amount", "min_amount", "max_amount",
+                 "payment_method", "market", "version")
+
+    def __init__(self, id: int, side: str, user_id: int, rate: Decimal, amount: Decimal,
+                 payment_method: str, min_amount: Decimal = None, max_amount: Decimal = None):
+        self.id = id
+        self.side = side
+        self.user_id = user_id
+        self.rate = Decimal(rate)
+        self.amount = Decimal(amount)
+        self.min_amount = Decimal(min_amount) if min_amount else ZERO
+        self.max_amount = Decimal(max_amount) if max_amount else None
+        self.payment_method = payment_method
+        self.market = market_key(payment_method)
+        self.version = 0
+
+    @classmethod
+    def from_listing(cls, listing) -> "Order":
+        return cls(listing.id, listing.type, listing.user_id, listing.rate, listing.amount,
+                   listing.payment_method, listing.min_amount, listing.max_amount)
+
+    @property
+    def tradeable(self) -> bool:
+        return self.amount > 0 and self.amount >= self.min_amount
+
+class Fill(NamedTuple):
+    maker_id: int         # resting listing (its rate is the deal rate)
+    taker_id: int         # incoming listing
+    buyer_id: int
+    seller_id: int
+    rate: Decimal
+    amount: Decimal       # USDT
+    etb_amount: Decimal
+    maker_remaining: Decimal
+    payment_method: str   # the resting listing's
+
+def fill_size(remaining: Decimal, maker_remaining: Decimal, taker: Order, maker: Order) -> Optional[Decimal]:
+    """Largest amount both listings accept for one deal, or None"""
+    size = min(remaining, maker_remaining)
+    if taker.max_amount is not None and taker.max_amount < size:
+        size = taker.max_amount
+    if maker.max_amount is not None and maker.max_amount < size:
+        size = maker.max_amount
+    if size <= 0 or size < taker.min_amount or size < maker.min_amount:
+        return None
+    return size
+
+class MatchingEngine:
+    """Resting listings per (payment method, side) in price-time priority"""
+
+    def __init__(self, scan_limit: int = MATCH_SCAN_LIMIT):
+        self.scan_limit = scan_limit
+        self.orders: Dict[int, Order] = {}
+        self.books: Dict[Tuple[str, str], list] = {}  # heaps of (price key, id, version)
+        self._versions = 0
+        self._stale = 0
+        # Metrics
+        self.submitted = 0
+        self.fills = 0
+        self.skipped = 0
+
+    def load(self, orders: Iterable[Order]):
+        """Rest the given orders without matching them (they were already on the book)"""
+        self.orders.clear()
+        self.books.clear()
+        self._stale = 0
+        for order in sorted(orders, key=lambda order: order.id):
+            self.rest(order)
+
+    def _push(self, order: Order):
+        self._versions += 1
+        order.version = self._versions
+        key = -order.rate if order.side == "buy" else order.rate
+        heapq.heappush(self.books.setdefault((order.market, order.side), []),
+                       (key, order.id, order.version))
+
+    def _live(self, entry) -> Optional[Order]:
+        order = self.orders.get(entry[1])
+        if order is not None and order.version == entry[2]:
+            return order
+        return None
+
+    def rest(self, order: Order):
+        """Put an order on the book as is, if it can still trade"""
+        if order.tradeable:
+            self.orders[order.id] = order
+            self._push(order)
+
+    def remove(self, order_id: int):
+        if self.orders.pop(order_id, None) is not None:
+            self._stale += 1
+            if self._stale > len(self.orders) + 1024:
+                self._compact()
+
+    def keeps_priority(self, order: Order) -> bool:
+        """Whether an edit leaves the order resting where it is (same side, rate and market)"""
+        current = self.orders.get(order.id)
+        return (current is not None and current.side == order.side and current.rate == order.rate
+                and current.market == order.market)
+
+    def upsert(self, order: Order):
+        """Apply an edited order; price, side or market changes lose time priority"""
+        if self.keeps_priority(order):
+            current = self.orders[order.id]
+            current.amount = order.amount
+            current.min_amount = order.min_amount
+            current.max_amount = order.max_amount
+            current.user_id = order.user_id
+            if not current.tradeable:
+                self.remove(order.id)
+            return
+        self.remove(order.id)
+        self.rest(order)
+
+    def _compact(self):
+        """Drop stale heap entries left behind by removals and updates"""
+        for key, book in list(self.books.items()):
+            live = [entry for entry in book if self._live(entry) is not None]
+            if live:
+                heapq.heapify(live)
+                self.books[key] = live
+            else:
+                del self.books[key]
+        self._stale = 0
+
+    def match(self, taker: Order, commit: bool = True) -> List[Fill]:
+        """Fills for an incoming order against the opposite side, best price first
+
+        With commit, resting amounts are consumed, filled orders leave the book
+        and the taker's remainder rests. Without it nothing changes (a preview).
+        """
+        book = self.books.get((taker.market, "sell" if taker.side == "buy" else "buy"))
+        fills: List[Fill] = []
+        popped = []
+        skipped = 0
+        remaining = taker.amount
+        while book and remaining > 0 and remaining >= taker.min_amount:
+            entry = book[0]
+            maker = self._live(entry)
+            if maker is None:
+                heapq.heappop(book)
+                self._stale = max(0, self._stale - 1)
+                continue
+            crosses = maker.rate <= taker.rate if taker.side == "buy" else maker.rate >= taker.rate
+            if not crosses:
+                break
+            heapq.heappop(book)
+            popped.append(entry)
+            # Trade with this maker until one side is used up or the limits no longer fit
+            maker_remaining = maker.amount
+            traded = False
+            while maker.user_id != taker.user_id and remaining > 0 and remaining >= taker.min_amount:
+                size = fill_size(remaining, maker_remaining, taker, maker)
+                if size is None:
+                    break
+                traded = True
+                remaining -= size
+                maker_remaining -= size
+                fills.append(Fill(
+                    maker.id, taker.id,
+                    taker.user_id if taker.side == "buy" else maker.user_id,
+                    maker.user_id if taker.side == "buy" else taker.user_id,
+                    maker.rate, size, (size * maker.rate).quantize(ETB_QUANTUM), maker_remaining,
+                    maker.payment_method
+                ))
+            if not traded:
+                skipped += 1
+                if skipped > self.scan_limit:
+                    break
+                continue
+            if commit:
+                maker.amount = maker_remaining
+                if not maker.tradeable:
+                    del self.orders[maker.id]
+                    popped.pop()
+        # Resting orders that can still trade go back with their time priority
+        for entry in popped:
+            heapq.heappush(book, entry)
+        self.skipped += skipped
+        if commit:
+            self.submitted += 1
+            self.fills += len(fills)
+            taker.amount = remaining
+            self.remove(taker.id)
+            self.rest(taker)
+        return fills
+
+# Process-wide engine (loaded at startup when MATCHING_MODE is not "off")
+matching_engine = MatchingEngine()
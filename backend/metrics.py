@@ -0,0 +1,220 @@
+"""
+Prometheus-style request and SQL metrics
+
+A pure ASGI middleware times every request and labels it with the matched
+route template (not the raw path, so trade codes and ids do not explode the
+label set). SQLAlchemy cursor hooks add each statement's count, time and
+affected rows (the DB-API rowcount) to the request that issued it, found
+through a context variable, and a Session hook adds the rows each ORM
+execution returns (counted where the result is fetched, since the drivers
+report no rowcount for SELECT or RETURNING); statements from background tasks
+are labelled "<background>". Everything is plain counters updated
+in-process, so the cost per request is a few dict lookups and per statement
+two clock reads. GET /metrics renders the text format.
+"""
+
+import bisect
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BACKGROUND = ("", "<background>")
+UNMATCHED = "<unmatched>"
+
+class RouteMetrics:
+    """Counters for one (method, route) pair"""
+
+    __slots__ = ("requests", "errors", "statuses", "buckets", "duration", "queries", "db_time", "rows",
+                 "rows_returned")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.statuses: Dict[int, int] = {}
+        self.buckets = [0] * len(LATENCY_BUCKETS)  # non-cumulative; +Inf is requests
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.rows_returned = 0
+
+class RequestStats:
+    """SQL work done on behalf of the request in flight"""
+
+    __slots__ = ("queries", "db_time", "rows", "rows_returned")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.rows_returned = 0
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+class Metrics:
+    """Per-route request and SQL counters, rendered for Prometheus"""
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.started_at = time.time()
+
+    def route(self, key: Tuple[str, str]) -> RouteMetrics:
+        metrics = self.routes.get(key)
+        if metrics is None:
+            metrics = self.routes[key] = RouteMetrics()
+        return metrics
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        metrics = self.route((method, route))
+        metrics.requests += 1
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+        if status >= 500:
+            metrics.errors += 1
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        if index < len(LATENCY_BUCKETS):
+            metrics.buckets[index] += 1
+        metrics.duration += seconds
+        metrics.queries += stats.queries
+        metrics.db_time += stats.db_time
+        metrics.rows += stats.rows
+        metrics.rows_returned += stats.rows_returned
+
+    # SQLAlchemy cursor hooks
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        # DB-API rowcount: rows changed by DML, -1 where the driver doesn't report
+        # one (SELECTs, and RETURNING statements on aiosqlite)
+        count = max(cursor.rowcount, 0)
+        stats = _current.get()
+        if stats is None:
+            metrics = self.route(BACKGROUND)
+            metrics.queries += 1
+            metrics.db_time += elapsed
+            metrics.rows += count
+        else:
+            stats.queries += 1
+            stats.db_time += elapsed
+            stats.rows += count
+
+    # Session hook
+    def do_orm_execute(self, orm_execute_state):
+        """Count the rows an ORM execution returns; the result is handed back buffered"""
+        statement = orm_execute_state.statement
+        if not (orm_execute_state.is_select or len(getattr(statement, "exported_columns", ()))):
+            return None  # DML without RETURNING (or textual SQL): run it unchanged
+        result = orm_execute_state.invoke_statement()
+        # AsyncSession buffers every result anyway, so freezing costs one list copy
+        frozen = result.freeze()
+        stats = _current.get()
+        if stats is None:
+            self.route(BACKGROUND).rows_returned += len(frozen.data)
+        else:
+            stats.rows_returned += len(frozen.data)
+        return frozen()
+
+    def instrument(self, engine):
+        """Attach the cursor hooks to a (sync or async) engine, and the row counter to sessions"""
+        if not event.contains(Session, "do_orm_execute", self.do_orm_execute):
+            event.listen(Session, "do_orm_execute", self.do_orm_execute)
+        sync_engine = getattr(engine, "sync_engine", engine)
+        if event.contains(sync_engine, "before_cursor_execute", self.before_cursor_execute):
+            return
+        event.listen(sync_engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        routes = sorted(self.routes.items())
+        requests = [(key, m) for key, m in routes if key != BACKGROUND]
+
+        family("http_requests_total", "counter", "HTTP requests by route and status code")
+        for (method, route), m in requests:
+            for status, count in sorted(m.statuses.items()):
+                lines.append(f'http_requests_total{{{_labels(method, route)},status="{status}"}} {count}')
+
+        family("http_request_errors_total", "counter", "HTTP requests that failed with a 5xx status")
+        for (method, route), m in requests:
+            lines.append(f"http_request_errors_total{{{_labels(method, route)}}} {m.errors}")
+
+        family("http_request_duration_seconds", "histogram", "HTTP request latency")
+        for (method, route), m in requests:
+            labels = _labels(method, route)
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, m.buckets):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {m.requests}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {m.duration:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {m.requests}")
+
+        for name, attribute, help_text in (
+            ("db_queries_total", "queries", "SQL statements executed"),
+            ("db_query_duration_seconds_total", "db_time", "Time spent executing SQL statements"),
+            ("db_rows_returned_total", "rows_returned", "Rows returned to the application by ORM executions"),
+            ("db_rows_affected_total", "rows", "Rows changed by SQL statements (DB-API rowcount)"),
+        ):
+            family(name, "counter", help_text)
+            for (method, route), m in routes:
+                value = getattr(m, attribute)
+                value = f"{value:.6f}" if isinstance(value, float) else value
+                lines.append(f"{name}{{{_labels(method, route)}}} {value}")
+
+        family("process_start_time_seconds", "gauge", "Start time of the process since the Unix epoch")
+        lines.append(f"process_start_time_seconds {self.started_at:.3f}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(method: str, route: str) -> str:
+    return f'method="{_escape(method)}",route="{_escape(route)}"'
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and SQL work per route"""
+
+    def __init__(self, app, metrics: "Metrics" = None):
+        self.app = app
+        self.metrics = metrics or request_metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            self.metrics.observe_request(
+                scope["method"], getattr(route, "path", UNMATCHED), status,
+                time.perf_counter() - start, stats
+            )
+
+# Process-wide metrics
+request_metrics = Metrics()
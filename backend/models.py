@@ -2,13 +2,14 @@
 Database models for P2P USDT Trading Platform
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, DECIMAL, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime, timedelta
-import random
-import string
+import secrets
+
+from trade_codes import encode_trade_code
 
 Base = declarative_base()
 
@@ -50,6 +51,16 @@ class Listing(Base):
     # Relationships
     user = relationship("User", back_populates="listings")
     deals = relationship("Deal", back_populates="listing")
+    
+    __table_args__ = (
+        # GET /listings by status (+ type) in creation order; SQLite appends the
+        # rowid to every index, so id order comes for free after the equality columns
+        Index("idx_listings_status_type", "status", "type"),
+        # Rate-sorted pages of active listings and the order book load
+        Index("idx_listings_active_type_rate", "type", "rate",
+              sqlite_where=text("status = 'active'"), postgresql_where=text("status = 'active'")),
+        Index("idx_listings_user_id", "user_id"),
+    )
 
 class Deal(Base):
     __tablename__ = "deals"
@@ -75,12 +86,27 @@ class Deal(Base):
     seller = relationship("User", foreign_keys=[seller_id], back_populates="seller_deals")
     logs = relationship("Log", back_populates="deal")
     
+    __table_args__ = (
+        # Admin queue: deals by status in creation (id) order, and counts per status
+        Index("idx_deals_status", "status"),
+        # Expiry sweep: pending deals ordered by expiry
+        Index("idx_deals_status_expires_at", "status", "expires_at"),
+        # Stats reconciliation: released volume over the last 24h
+        Index("idx_deals_status_updated_at", "status", "updated_at"),
+        Index("idx_deals_buyer_id", "buyer_id"),
+        Index("idx_deals_seller_id", "seller_id"),
+        Index("idx_deals_listing_id", "listing_id"),
+    )
+    
+    @classmethod
+    def generate_trade_code(cls, deal_id):
+        """Trade code derived from the deal id, like #EZ01D5"""
+        return encode_trade_code(deal_id)
+    
     @classmethod
-    def generate_trade_code(cls):
-        """Generate a unique trade code like #EZ104"""
-        prefix = "EZ"
-        number = random.randint(100, 999)
-        return f"#{prefix}{number}"
+    def placeholder_trade_code(cls):
+        """Unique stand-in used until the insert has assigned the deal id"""
+        return "~" + secrets.token_hex(9)
     
     def set_expiry(self, hours=1.5):
         """Set deal expiry time (default 90 minutes)"""
@@ -107,4 +133,29 @@ class Log(Base):
     # Relationships
     deal = relationship("Deal", back_populates="logs")
     user = relationship("User", back_populates="logs")
+    
+    __table_args__ = (
+        # A deal's audit trail in order, and time-range scans for archival
+        Index("idx_logs_deal_id_timestamp", "deal_id", "timestamp"),
+        Index("idx_logs_timestamp", "timestamp"),
+        # Never reuse the id of an archived row (see log_archive.py)
+        {"sqlite_autoincrement": True},
+    )
+
 
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    
+    endpoint = Column(String(50), primary_key=True)
+    key = Column(String(100), primary_key=True)
+    request_hash = Column(String(64), nullable=False)  # sha256 of the request body
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    expires_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("idx_idempotency_keys_expires_at", "expires_at"),
+        # Keyed lookups only, so store rows in the primary-key b-tree itself
+        {"sqlite_with_rowid": False},
+    )
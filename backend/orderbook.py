@@ -0,0 +1,206 @@
+"""
+In-memory order book of active listings, kept in sync with the listings table
+
+Listings are indexed per side for the whole market and per side for each
+payment method, with the amount at every price level maintained on insert
+and removal. The book is per process: it is loaded from the database at
+startup and updated by the endpoints that write listings, so it assumes a
+single API worker.
+"""
+
+import bisect
+import heapq
+import logging
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from quotes import QuoteIndex
+from schemas import ListingResponse, UserResponse
+from serializers import item_json, to_plain
+
+logger = logging.getLogger(__name__)
+
+SIDES = ("buy", "sell")
+
+def book_entry(listing) -> ListingResponse:
+    """ListingResponse for a committed row, built without validation
+
+    Rows are already in the database, so re-checking the create-time rules
+    (positive amount and rate) would only make one odd row break the book.
+    """
+    fields = to_plain(listing, ListingResponse)
+    if fields["user"] is not None:
+        fields["user"] = UserResponse.model_construct(**fields["user"])
+    return ListingResponse.model_construct(**fields)
+
+class BookSide:
+    """Active listings of one side, indexed by creation order and by price level"""
+
+    def __init__(self, side: str):
+        self.side = side
+        self.ids: List[int] = []                  # listing ids, creation order
+        self.rates: List[Decimal] = []            # distinct price levels, ascending
+        self.levels: Dict[Decimal, List[int]] = {}  # rate -> listing ids, time order
+        self.level_amounts: Dict[Decimal, Decimal] = {}  # rate -> total amount
+        self.amount = Decimal("0")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, listing_id: int, rate: Decimal, amount: Decimal):
+        bisect.insort(self.ids, listing_id)
+        level = self.levels.get(rate)
+        if level is None:
+            bisect.insort(self.rates, rate)
+            level = self.levels[rate] = []
+            self.level_amounts[rate] = Decimal("0")
+        bisect.insort(level, listing_id)
+        self.level_amounts[rate] += amount
+        self.amount += amount
+
+    def discard(self, listing_id: int, rate: Decimal, amount: Decimal):
+        _remove_sorted(self.ids, listing_id)
+        level = self.levels.get(rate)
+        if level is None:
+            return
+        _remove_sorted(level, listing_id)
+        self.level_amounts[rate] -= amount
+        self.amount -= amount
+        if not level:
+            del self.levels[rate]
+            del self.level_amounts[rate]
+            _remove_sorted(self.rates, rate)
+
+    def iter_ids(self, sort: str, after: Optional[tuple] = None) -> Iterator[int]:
+        """Listing ids in GET /listings order, starting after a keyset cursor"""
+        if sort == "created_at":
+            start = bisect.bisect_right(self.ids, after[0]) if after else 0
+            for i in range(start, len(self.ids)):
+                yield self.ids[i]
+            return
+        start = bisect.bisect_left(self.rates, after[0]) if after else 0
+        for i in range(start, len(self.rates)):
+            level = self.levels[self.rates[i]]
+            first = 0
+            if after and self.rates[i] == after[0]:
+                first = bisect.bisect_right(level, after[1])
+            for j in range(first, len(level)):
+                yield level[j]
+
+    def iter_rates(self) -> Iterator[Decimal]:
+        """Price levels best first: highest bid for buy, lowest ask for sell"""
+        if self.side == "buy":
+            return reversed(self.rates)
+        return iter(self.rates)
+
+    def iter_priority(self) -> Iterator[int]:
+        """Listing ids in price-time priority"""
+        for rate in self.iter_rates():
+            yield from self.levels[rate]
+
+    def best_rate(self) -> Optional[Decimal]:
+        if not self.rates:
+            return None
+        return self.rates[-1] if self.side == "buy" else self.rates[0]
+
+    def depth(self, levels: int = 10) -> List[Tuple[Decimal, Decimal, int]]:
+        """Aggregated (rate, total amount, listing count) per price level, best first"""
+        return [
+            (rate, self.level_amounts[rate], len(self.levels[rate]))
+            for rate in islice(self.iter_rates(), levels)
+        ]
+
+def _remove_sorted(items: list, value):
+    i = bisect.bisect_left(items, value)
+    if i < len(items) and items[i] == value:
+        del items[i]
+
+class OrderBook:
+    """Active listings per side, sorted by rate and then time"""
+
+    def __init__(self):
+        self.listings: Dict[int, ListingResponse] = {}
+        self.listing_json: Dict[int, bytes] = {}  # pre-encoded ListingResponse per listing
+        self.sides = {side: BookSide(side) for side in SIDES}
+        self.markets: Dict[str, Dict[str, BookSide]] = {}  # payment method -> sides
+        self.quotes = QuoteIndex()  # amount ranges, for GET /quote
+        self.ready = False
+
+    def load(self, listings):
+        """Rebuild the book from active Listing rows (with their user loaded)"""
+        self.listings.clear()
+        self.listing_json.clear()
+        self.sides = {side: BookSide(side) for side in SIDES}
+        self.markets = {}
+        self.quotes = QuoteIndex()
+        for listing in listings:
+            try:
+                self.upsert(listing)
+            except Exception:
+                # One unreadable row must not keep the API from starting
+                logger.exception("Skipping listing %s while loading the order book", listing.id)
+        self.ready = True
+
+    def upsert(self, listing):
+        """Apply a created or updated Listing row; non-active listings leave the book"""
+        self.remove(listing.id)
+        if listing.status != "active" or listing.type not in self.sides:
+            return
+        # Build everything that can fail before touching the indexes
+        entry = book_entry(listing)
+        encoded = item_json(entry, ListingResponse)
+        self.listings[entry.id] = entry
+        self.listing_json[entry.id] = encoded
+        self.sides[entry.type].add(entry.id, entry.rate, entry.amount)
+        market = self.markets.get(entry.payment_method)
+        if market is None:
+            market = self.markets[entry.payment_method] = {side: BookSide(side) for side in SIDES}
+        market[entry.type].add(entry.id, entry.rate, entry.amount)
+        self.quotes.add(entry)
+
+    def remove(self, listing_id: int):
+        entry = self.listings.pop(listing_id, None)
+        if not entry:
+            return
+        del self.listing_json[listing_id]
+        self.sides[entry.type].discard(entry.id, entry.rate, entry.amount)
+        market = self.markets[entry.payment_method]
+        market[entry.type].discard(entry.id, entry.rate, entry.amount)
+        self.quotes.discard(entry)
+        if not any(len(side) for side in market.values()):
+            del self.markets[entry.payment_method]
+
+    def count(self, type: Optional[str] = None) -> int:
+        if type in self.sides:
+            return len(self.sides[type])
+        return len(self.listings)
+
+    def rows(self, type: Optional[str], sort: str, after: Optional[tuple] = None,
+             offset: int = 0, limit: int = 50) -> List[ListingResponse]:
+        """A page of listings in the same order the SQL path of GET /listings uses"""
+        sides = [self.sides[type]] if type in self.sides else list(self.sides.values())
+        if sort == "created_at":
+            key = None
+        else:
+            key = lambda listing_id: (self.listings[listing_id].rate, listing_id)
+        merged = heapq.merge(*(side.iter_ids(sort, after) for side in sides), key=key)
+        return [self.listings[i] for i in islice(merged, offset, offset + limit)]
+
+    def best(self, side: str) -> Optional[ListingResponse]:
+        """Best-priced listing on a side (earliest one at that price)"""
+        for listing_id in self.sides[side].iter_priority():
+            return self.listings[listing_id]
+        return None
+
+    def top(self, side: str, limit: int = 10) -> List[ListingResponse]:
+        """Top N listings on a side in price-time priority"""
+        ids = islice(self.sides[side].iter_priority(), limit)
+        return [self.listings[i] for i in ids]
+
+    def depth(self, side: str, levels: int = 10) -> List[Tuple[Decimal, Decimal, int]]:
+        """Aggregated (rate, total amount, listing count) per price level, best first"""
+        return self.sides[side].depth(levels)
+
+# Process-wide order book
+order_book = OrderBook()
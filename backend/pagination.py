@@ -0,0 +1,53 @@
+"""
+Opaque keyset (cursor) pagination helpers for list endpoints
+"""
+
+import base64
+import json
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+def encode_cursor(sort: str, values) -> str:
+    """Encode the sort key of the last row on a page into an opaque cursor"""
+    payload = {"s": sort, "v": [str(v) if isinstance(v, Decimal) else v for v in values]}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str) -> list:
+    """Decode a cursor produced by encode_cursor for the same sort order"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload["v"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if payload.get("s") != sort:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    return values
+
+def cursor_values(columns, values) -> tuple:
+    """Convert decoded cursor values back to the Python types of their columns"""
+    if len(columns) != len(values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        return tuple(column.type.python_type(value) for column, value in zip(columns, values))
+    except (ValueError, ArithmeticError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def after_cursor(columns, values):
+    """Row-value predicate (c1, c2, ...) > (v1, v2, ...) for ascending keyset order"""
+    values = cursor_values(columns, values)
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, column > values[i]))
+    return or_(*clauses)
+
+def split_page(rows, limit: int, sort: str, columns):
+    """Trim a limit+1 fetch to one page and build the cursor for the next one"""
+    page = rows[:limit]
+    if len(rows) <= limit or not page:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor(sort, [getattr(last, column.key) for column in columns])
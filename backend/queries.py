@@ -0,0 +1,110 @@
+"""
+Statement builders for the API's hot queries
+
+Endpoints build their statements here and query_plans.py EXPLAINs the same
+builders, so the plan check always covers the SQL that is actually sent.
+"""
+
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update, func, and_, or_
+from sqlalchemy.orm import joinedload, raiseload
+
+from models import User, Listing, Deal
+from pagination import after_cursor
+from trade_codes import encode_trade_code, decode_trade_code
+
+# Keyset sort orders for paginated endpoints. Ids are allocated at insert time,
+# so id order is creation order and avoids comparing datetimes across formats.
+LISTING_SORTS = {
+    "created_at": (Listing.id,),
+    "rate": (Listing.rate, Listing.id),
+}
+DEAL_SORTS = {
+    "created_at": (Deal.id,),
+}
+
+# Loader options for read endpoints: every relationship the response model
+# serializes is joined into the main SELECT and any other relationship access
+# raises instead of lazy-loading, so a page costs one query whatever its size.
+def listing_load_options():
+    """Loader options for ListingResponse (listing + user in one SELECT)"""
+    return (joinedload(Listing.user), raiseload("*"))
+
+def deal_load_options():
+    """Loader options for DealResponse (deal + listing/user + buyer + seller in one SELECT)"""
+    return (
+        joinedload(Deal.listing).joinedload(Listing.user),
+        joinedload(Deal.buyer),
+        joinedload(Deal.seller),
+        raiseload("*"),
+    )
+
+def count_query(query):
+    """Row count of a filtered SELECT"""
+    return select(func.count()).select_from(query.subquery())
+
+def page_query(query, sort_columns, after: Optional[list] = None, offset: int = 0, limit: int = 50):
+    """One page in sort order, after a decoded keyset cursor or from an offset"""
+    if after is not None:
+        query = query.where(after_cursor(sort_columns, after))
+    else:
+        query = query.offset(offset)
+    return query.order_by(*sort_columns).limit(limit)
+
+def listings_query(status: str, type: Optional[str] = None):
+    """Listings in a status, optionally of one type"""
+    query = select(Listing).where(Listing.status == status)
+    if type is not None:
+        query = query.where(Listing.type == type)
+    return query
+
+def active_listings():
+    """Every active listing with its user, for building the order book"""
+    return listings_query("active").options(*listing_load_options())
+
+def listings_by_id(listing_ids: Iterable[int]):
+    """Listings with their users, reloaded over any stale identity-map copies"""
+    return (
+        select(Listing).where(Listing.id.in_(listing_ids))
+        .options(*listing_load_options())
+        .execution_options(populate_existing=True)
+    )
+
+def deals_query(status: str):
+    """Deals in a status"""
+    return select(Deal).where(Deal.status == status)
+
+def trade_code_filter(trade_code: str):
+    """WHERE clause for a trade code: a primary-key lookup for sequence codes"""
+    deal_id = decode_trade_code(trade_code)
+    if deal_id is None:
+        # Legacy random codes are only reachable through the trade_code index
+        return Deal.trade_code == trade_code
+    return and_(Deal.id == deal_id, Deal.trade_code == encode_trade_code(deal_id))
+
+def deal_by_trade_code(trade_code: str):
+    """A deal with everything DealResponse serializes"""
+    return select(Deal).where(trade_code_filter(trade_code)).options(*deal_load_options())
+
+def transition_statement(trade_code: str, from_status: str, to_status: str, *conditions, returning=()):
+    """Guarded UPDATE ... RETURNING moving one deal from from_status to to_status"""
+    return (
+        update(Deal)
+        .where(trade_code_filter(trade_code), Deal.status == from_status, *conditions)
+        .values(status=to_status)
+        .returning(Deal.id, Deal.trade_code, *returning)
+        .execution_options(synchronize_session=False)
+    )
+
+def user_by_username(telegram_username: str):
+    return select(User).where(User.telegram_username == telegram_username)
+
+def user_by_telegram_id(telegram_id: str):
+    return select(User).where(User.telegram_id == telegram_id)
+
+def existing_users(usernames: Iterable[str], telegram_ids: Iterable[str]):
+    """(username, telegram_id) of users holding any of the given usernames or ids"""
+    return select(User.telegram_username, User.telegram_id).where(or_(
+        User.telegram_username.in_(usernames), User.telegram_id.in_(telegram_ids)
+    ))
@@ -0,0 +1,167 @@
+"""
+EXPLAIN QUERY PLAN regression check for the hot queries
+
+Each query below is built by the same function the endpoint or background
+task calls (queries.py, search.py, expiry.py, stats.py, log_archive.py). They
+are run against a fresh schema (or an existing SQLite database) inside a
+rolled-back transaction, and the plan SQLite chooses for every statement is
+captured. The check fails when any of them scans a whole table, or walks a
+whole index where it should seek, instead of searching an index. Against an
+analyzed database SQLite may legitimately scan a table that only holds a
+handful of rows.
+
+Usage (from backend/): python query_plans.py [--database sqlite:///path.db] [--verbose]
+"""
+
+import argparse
+import re
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
+
+import queries
+from expiry import expire_statement, backlog_query
+from log_archive import row_cap_query, archive_statement, live_logs_query
+from models import Base, Deal
+from search import create_search_index, search_queries
+from stats import status_counts_query, commission_query, released_volume_query
+from trade_codes import encode_trade_code
+
+# "SCAN deals", "SCAN TABLE deals AS d", "SCAN deals USING COVERING INDEX idx_deals_status"
+TABLE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?$")
+
+# Aggregates over every row, where a full walk of a (covering) index is the best plan,
+# and ordered index walks that stop at their OFFSET
+FULL_SCANS = {"stats deal counts", "log archive row cap"}
+
+def hot_queries():
+    """(name, statement) for every query on a request or background hot path
+
+    Built with the same builders the endpoints and background tasks call.
+    """
+    now = datetime.utcnow()
+    code = encode_trade_code(1)
+    by_id, by_rate = queries.LISTING_SORTS["created_at"], queries.LISTING_SORTS["rate"]
+    listings = queries.listing_load_options()
+    inactive = queries.listings_query("inactive")
+    matching, ranked = search_queries("telebirr", "sqlite", "sell", "active")
+    paid = queries.deals_query("paid")
+    return [
+        ("order book load",
+         queries.active_listings()),
+        ("listings by status, newest page",
+         queries.page_query(inactive.options(*listings), by_id, limit=51)),
+        ("listings by status+type, keyset page",
+         queries.page_query(queries.listings_query("inactive", "sell").options(*listings), by_id, [100], limit=51)),
+        ("active listings by type, rate order",
+         queries.page_query(queries.listings_query("active", "buy").options(*listings), by_rate, limit=51)),
+        ("listing count by status",
+         queries.count_query(inactive)),
+        ("listing count by status+type",
+         queries.count_query(queries.listings_query("inactive", "buy"))),
+        ("listing search",
+         ranked.options(*listings).offset(0).limit(20)),
+        ("listing search count",
+         queries.count_query(matching)),
+        ("listings by id (order book sync)",
+         queries.listings_by_id([1, 2, 3])),
+        ("deal by trade code",
+         queries.deal_by_trade_code(code)),
+        ("deal by legacy trade code",
+         queries.deal_by_trade_code("#AB12CD")),
+        ("pending deals queue page",
+         queries.page_query(paid.options(*queries.deal_load_options()), queries.DEAL_SORTS["created_at"],
+                            [100], limit=51)),
+        ("pending deals count",
+         queries.count_query(paid)),
+        ("deal transition (guarded update)",
+         queries.transition_statement(code, "paid", "released",
+                                      returning=(Deal.usdt_amount, Deal.commission_amount))),
+        ("deal transition (legacy trade code)",
+         queries.transition_statement("#AB12CD", "pending", "paid", Deal.seller_id == 1)),
+        ("expiry sweep batch",
+         expire_statement(now, 500)),
+        ("expiry backlog",
+         backlog_query(now)),
+        ("stats deal counts",
+         status_counts_query()),
+        ("stats commission",
+         commission_query()),
+        ("stats released volume",
+         released_volume_query(now - timedelta(hours=24))),
+        ("deals of a buyer",
+         select(Deal.id).where(Deal.buyer_id == 1)),
+        ("deals of a seller",
+         select(Deal.id).where(Deal.seller_id == 1)),
+        ("deal audit trail",
+         live_logs_query(deal_id=1)),
+        ("log archive batch",
+         archive_statement(now - timedelta(days=90), 1000)),
+        ("log archive row cap",
+         row_cap_query(100)),
+        ("logs in a time range",
+         live_logs_query(since=now - timedelta(days=2), until=now - timedelta(days=1), limit=100)),
+        ("user by username",
+         queries.user_by_username("abebe")),
+        ("user by telegram id",
+         queries.user_by_telegram_id("123")),
+        ("users by username or telegram id",
+         queries.existing_users(["a", "b"], ["1", "2"])),
+    ]
+
+def capture_plans(engine):
+    """{query name: [plan lines]} for every statement each hot query executes"""
+    plans = {}
+    current = []
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        current.extend(row[3] for row in cursor.fetchall())
+
+    event.listen(engine, "before_cursor_execute", explain)
+    try:
+        with Session(engine) as db:
+            for name, statement in hot_queries():
+                current.clear()
+                db.execute(statement).all()
+                plans[name] = list(current)
+            db.rollback()
+    finally:
+        event.remove(engine, "before_cursor_execute", explain)
+    return plans
+
+def table_scans(plan, tables, allow_index_scan=False):
+    """Plan lines that read every row of one of the given tables"""
+    scans = []
+    for line in plan:
+        match = TABLE_SCAN.match(line)
+        if match and match.group(1) in tables and not (allow_index_scan and match.group(2)):
+            scans.append(line)
+    return scans
+
+def main(args) -> int:
+    engine = create_engine(args.database)
+    if args.database == "sqlite://":
+        with engine.begin() as conn:
+            Base.metadata.create_all(conn)
+            create_search_index(conn)
+    plans = capture_plans(engine)
+    tables = set(Base.metadata.tables)
+    failures = 0
+    for name, plan in plans.items():
+        scans = table_scans(plan, tables, allow_index_scan=name in FULL_SCANS)
+        failures += bool(scans)
+        print(f"{'FAIL' if scans else 'ok':>4}  {name}")
+        for line in (plan if args.verbose else scans):
+            print(f"        {line}")
+    print(f"\n{len(plans) - failures}/{len(plans)} hot queries search an index")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database", default="sqlite://",
+                        help="SQLAlchemy URL of an existing SQLite database (default: fresh in-memory schema)")
+    parser.add_argument("--verbose", action="store_true", help="print every plan line")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,143 @@
+"""
+Amount-aware quotes: the best-priced listings that accept a given amount
+
+A listing accepts an amount when it lies in [min_amount, max_amount] and
+the listing still has that much left, so each listing is an interval on the
+amount axis and a quote is a stabbing query ordered by price. AmountIndex
+keeps one side's listings in price-time priority, cut into blocks of a few
+hundred, and every block carries the union bounds of its listings'
+intervals (lowest min, highest max). A quote walks the blocks best price
+first, skips every block whose bounds exclude the amount, and scans the
+rest until it has enough listings. Inserts and removals touch one block.
+
+Amounts and rates are compared as floats; the conversion is monotonic, so
+order and bounds are preserved exactly for the two-decimal values stored.
+"""
+
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+BLOCK_SIZE = 128  # blocks split at twice this
+
+# (price key, listing id, lowest amount, highest amount)
+Entry = Tuple[float, int, float, float]
+
+def amount_bounds(listing) -> Tuple[float, float]:
+    """Smallest and largest amount a listing accepts for one deal"""
+    low = float(listing.min_amount) if listing.min_amount else 0.0
+    high = float(listing.amount)
+    if listing.max_amount and float(listing.max_amount) < high:
+        high = float(listing.max_amount)
+    return low, high
+
+class AmountIndex:
+    """One side's listings in price-time priority with per-block amount bounds"""
+
+    def __init__(self, side: str, block_size: int = BLOCK_SIZE):
+        self.side = side
+        self.block_size = block_size
+        self.blocks: List[List[Entry]] = []
+        self.maxes: List[Tuple[float, int]] = []  # last (price key, id) per block
+        self.lows: List[float] = []               # lowest min amount per block
+        self.highs: List[float] = []              # highest max amount per block
+        self.entries: Dict[int, Entry] = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, listing_id: int, rate, low: float, high: float):
+        # Best price first: highest rate for buy listings, lowest for sell
+        key = -float(rate) if self.side == "buy" else float(rate)
+        entry = (key, listing_id, low, high)
+        self.entries[listing_id] = entry
+        if not self.blocks:
+            self.blocks.append([entry])
+            self.maxes.append((key, listing_id))
+            self.lows.append(low)
+            self.highs.append(high)
+            return
+        b = bisect.bisect_left(self.maxes, (key, listing_id))
+        if b == len(self.blocks):
+            b -= 1
+        block = self.blocks[b]
+        bisect.insort(block, entry)
+        self.maxes[b] = block[-1][:2]
+        if low < self.lows[b]:
+            self.lows[b] = low
+        if high > self.highs[b]:
+            self.highs[b] = high
+        if len(block) > 2 * self.block_size:
+            self._split(b)
+
+    def discard(self, listing_id: int):
+        entry = self.entries.pop(listing_id, None)
+        if entry is None:
+            return
+        b = bisect.bisect_left(self.maxes, entry[:2])
+        block = self.blocks[b]
+        del block[bisect.bisect_left(block, entry)]
+        if not block:
+            del self.blocks[b], self.maxes[b], self.lows[b], self.highs[b]
+            return
+        self.maxes[b] = block[-1][:2]
+        if entry[2] == self.lows[b] or entry[3] == self.highs[b]:
+            self._bound(b)
+
+    def _bound(self, b: int):
+        block = self.blocks[b]
+        self.lows[b] = min(entry[2] for entry in block)
+        self.highs[b] = max(entry[3] for entry in block)
+
+    def _split(self, b: int):
+        block = self.blocks[b]
+        half = len(block) // 2
+        self.blocks[b:b + 1] = [block[:half], block[half:]]
+        self.maxes[b:b + 1] = [block[half - 1][:2], block[-1][:2]]
+        self.lows[b:b + 1] = [0.0, 0.0]
+        self.highs[b:b + 1] = [0.0, 0.0]
+        self._bound(b)
+        self._bound(b + 1)
+
+    def quote(self, amount: float, limit: int = 10) -> List[int]:
+        """Ids of the best-priced listings that accept the amount"""
+        found: List[int] = []
+        lows, highs = self.lows, self.highs
+        for b in range(len(self.blocks)):
+            if lows[b] > amount or highs[b] < amount:
+                continue
+            for _, listing_id, low, high in self.blocks[b]:
+                if low <= amount <= high:
+                    found.append(listing_id)
+                    if len(found) == limit:
+                        return found
+        return found
+
+class QuoteIndex:
+    """AmountIndex per side, for the whole market and per payment method"""
+
+    def __init__(self):
+        self.indexes: Dict[Tuple[Optional[str], str], AmountIndex] = {}
+
+    def add(self, listing):
+        low, high = amount_bounds(listing)
+        for market in (None, listing.payment_method):
+            index = self.indexes.get((market, listing.type))
+            if index is None:
+                index = self.indexes[(market, listing.type)] = AmountIndex(listing.type)
+            index.add(listing.id, listing.rate, low, high)
+
+    def discard(self, listing):
+        for market in (None, listing.payment_method):
+            index = self.indexes.get((market, listing.type))
+            if index is not None:
+                index.discard(listing.id)
+                if not index:
+                    del self.indexes[(market, listing.type)]
+
+    def quote(self, side: str, amount: float, payment_method: Optional[str] = None,
+              limit: int = 10) -> List[int]:
+        """Best listings of `side` that accept the amount, optionally for one payment method"""
+        index = self.indexes.get((payment_method, side))
+        if index is None:
+            return []
+        return index.quote(amount, limit)
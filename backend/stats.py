@@ -0,0 +1,135 @@
+"""
+Incrementally maintained platform statistics
+
+Deal counters are updated by the endpoints on every deal state transition and
+reconciled against SQL in the background, so GET /stats is O(1) whatever the
+size of the tables. Active listing counts come from the in-memory order book.
+"""
+
+import asyncio
+import logging
+import os
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import select, func
+
+from models import Deal
+
+logger = logging.getLogger(__name__)
+
+STATS_RECONCILE_SECONDS = float(os.getenv("STATS_RECONCILE_SECONDS", "300"))
+DEAL_STATUSES = ("pending", "escrowed", "paid", "released", "cancelled", "disputed")
+VOLUME_WINDOW = timedelta(hours=24)
+BUCKET_SECONDS = 60
+EPOCH = datetime(1970, 1, 1)
+
+def status_counts_query():
+    return select(Deal.status, func.count(Deal.id)).group_by(Deal.status)
+
+def commission_query():
+    return select(func.coalesce(func.sum(Deal.commission_amount), 0)).where(Deal.status == "released")
+
+def released_volume_query(since: datetime):
+    """(usdt_amount, updated_at) of deals released since the given time, oldest first"""
+    return (
+        select(Deal.usdt_amount, Deal.updated_at)
+        .where(Deal.status == "released", Deal.updated_at >= since)
+        .order_by(Deal.updated_at)
+    )
+
+class PlatformStats:
+    """Deal counts per status, 24h released volume and accrued commission"""
+
+    def __init__(self, reconcile_interval: float = STATS_RECONCILE_SECONDS):
+        self.reconcile_interval = reconcile_interval
+        self.deals_by_status = Counter()
+        self.commission_accrued = Decimal("0")
+        # Released volume in per-minute buckets: (bucket number, usdt amount)
+        self.volume_buckets = deque()
+        self.volume_24h = Decimal("0")
+        self.reconciled_at: Optional[datetime] = None
+        self.last_drift = 0
+        self.session_factory = None
+        self._task: Optional[asyncio.Task] = None
+
+    def deal_created(self, count: int = 1):
+        self.deals_by_status["pending"] += count
+
+    def deal_transition(self, old: str, new: str, count: int = 1,
+                        usdt_amount: Decimal = None, commission: Decimal = None):
+        """Record deals moving from one status to another"""
+        self.deals_by_status[old] -= count
+        self.deals_by_status[new] += count
+        if new == "released":
+            self.commission_accrued += Decimal(commission or 0)
+            self._add_volume(Decimal(usdt_amount or 0), datetime.utcnow())
+
+    def _add_volume(self, amount: Decimal, at: datetime):
+        bucket = int((at - EPOCH).total_seconds()) // BUCKET_SECONDS
+        if self.volume_buckets and self.volume_buckets[-1][0] == bucket:
+            self.volume_buckets[-1] = (bucket, self.volume_buckets[-1][1] + amount)
+        else:
+            self.volume_buckets.append((bucket, amount))
+        self.volume_24h += amount
+
+    def _evict_volume(self, now: datetime):
+        oldest = int((now - VOLUME_WINDOW - EPOCH).total_seconds()) // BUCKET_SECONDS
+        while self.volume_buckets and self.volume_buckets[0][0] <= oldest:
+            self.volume_24h -= self.volume_buckets.popleft()[1]
+
+    def snapshot(self, order_book) -> dict:
+        self._evict_volume(datetime.utcnow())
+        buy, sell = order_book.count("buy"), order_book.count("sell")
+        return {
+            "active_listings": {"buy": buy, "sell": sell, "total": buy + sell},
+            "deals": {status: self.deals_by_status[status] for status in DEAL_STATUSES},
+            "volume_24h": str(self.volume_24h),
+            "commission_accrued": str(self.commission_accrued),
+            "reconciled_at": self.reconciled_at.isoformat() if self.reconciled_at else None
+        }
+
+    async def reconcile(self):
+        """Recompute every counter from SQL and record how far they had drifted"""
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            counts = Counter(dict((await db.execute(status_counts_query())).all()))
+            commission = await db.scalar(commission_query())
+            released = (await db.execute(released_volume_query(now - VOLUME_WINDOW))).all()
+        statuses = set(counts) | set(self.deals_by_status)
+        self.last_drift = sum(abs(counts[s] - self.deals_by_status[s]) for s in statuses)
+        self.deals_by_status = counts
+        self.commission_accrued = Decimal(commission)
+        self.volume_buckets.clear()
+        self.volume_24h = Decimal("0")
+        for amount, at in released:
+            self._add_volume(Decimal(amount), at)
+        self.reconciled_at = now
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception:
+                logger.exception("Stats reconciliation failed")
+
+    async def start(self, session_factory):
+        """Load the counters and start periodic reconciliation"""
+        self.session_factory = session_factory
+        await self.reconcile()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Process-wide statistics
+platform_stats = PlatformStats()
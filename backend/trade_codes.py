@@ -0,0 +1,53 @@
+"""
+Sequence-derived trade codes: Crockford base32 of the deal id plus a check character
+
+A code such as #EZ01D5 encodes deal id 45 ("01D") followed by a Luhn mod 32
+check character ("5"), so codes never collide, need no retries and decode
+straight back to the deal's primary key.
+"""
+
+from typing import Optional
+
+PREFIX = "#EZ"
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32, no I/L/O/U
+MIN_DIGITS = 3
+
+# Characters people commonly type for the ones Crockford leaves out
+_READ_AS = str.maketrans({"I": "1", "L": "1", "O": "0"})
+
+def _check_char(payload: str) -> str:
+    """Luhn mod 32 check character over the payload"""
+    n = len(ALPHABET)
+    factor, total = 2, 0
+    for ch in reversed(payload):
+        addend = factor * ALPHABET.index(ch)
+        total += addend // n + addend % n
+        factor = 1 if factor == 2 else 2
+    return ALPHABET[(n - total % n) % n]
+
+def encode_trade_code(deal_id: int) -> str:
+    """Trade code for a deal primary key"""
+    if deal_id < 0:
+        raise ValueError("deal_id must be non-negative")
+    digits = ""
+    while deal_id:
+        deal_id, r = divmod(deal_id, 32)
+        digits = ALPHABET[r] + digits
+    payload = digits.rjust(MIN_DIGITS, "0")
+    return PREFIX + payload + _check_char(payload)
+
+def decode_trade_code(code: str) -> Optional[int]:
+    """Deal primary key for a trade code, or None if it is not a valid sequence code"""
+    body = code.strip().upper().lstrip("#")
+    if not body.startswith(PREFIX[1:]):
+        return None
+    body = body[len(PREFIX) - 1:].translate(_READ_AS)
+    if len(body) < MIN_DIGITS + 1 or any(ch not in ALPHABET for ch in body):
+        return None
+    payload, check = body[:-1], body[-1]
+    if _check_char(payload) != check:
+        return None
+    deal_id = 0
+    for ch in payload:
+        deal_id = deal_id * 32 + ALPHABET.index(ch)
+    return deal_id
@@ -27,12 +27,13 @@ def init_database():
         with open(schema_path, 'r') as f:
             schema_sql = f.read()
         
-        # Execute schema (split by semicolon to handle multiple statements)
-        statements = schema_sql.split(';')
-        for statement in statements:
-            statement = statement.strip()
-            if statement:
+        # Execute schema one complete statement at a time (trigger bodies contain semicolons)
+        statement = ""
+        for line in schema_sql.splitlines(keepends=True):
+            statement += line
+            if sqlite3.complete_statement(statement):
                 cursor.execute(statement)
+                statement = ""
         
         conn.commit()
         print(f"✅ Database initialized successfully at: {db_path}")
@@ -65,15 +65,55 @@ CREATE TABLE IF NOT EXISTS logs (
     FOREIGN KEY (user_id) REFERENCES users (id)
 );
 
--- Indexes for better performance
-CREATE INDEX IF NOT EXISTS idx_listings_type_status ON listings (type, status);
+-- Stored responses for Idempotency-Key retries (backend/idempotency.py)
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    endpoint VARCHAR(50) NOT NULL,
+    key VARCHAR(100) NOT NULL,
+    request_hash VARCHAR(64) NOT NULL,
+    status_code INTEGER NOT NULL,
+    response_body TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (endpoint, key)
+) WITHOUT ROWID;
+
+-- Indexes for the hot query shapes (declared in backend/models.py; keep in sync).
+-- SQLite appends the rowid to every index, so equality columns + id order need no sort.
+CREATE INDEX IF NOT EXISTS idx_listings_status_type ON listings (status, type);
+CREATE INDEX IF NOT EXISTS idx_listings_active_type_rate ON listings (type, rate) WHERE status = 'active';
 CREATE INDEX IF NOT EXISTS idx_listings_user_id ON listings (user_id);
 CREATE INDEX IF NOT EXISTS idx_deals_status ON deals (status);
+CREATE INDEX IF NOT EXISTS idx_deals_status_expires_at ON deals (status, expires_at);
+CREATE INDEX IF NOT EXISTS idx_deals_status_updated_at ON deals (status, updated_at);
 CREATE INDEX IF NOT EXISTS idx_deals_trade_code ON deals (trade_code);
 CREATE INDEX IF NOT EXISTS idx_deals_buyer_id ON deals (buyer_id);
 CREATE INDEX IF NOT EXISTS idx_deals_seller_id ON deals (seller_id);
-CREATE INDEX IF NOT EXISTS idx_logs_deal_id ON logs (deal_id);
+CREATE INDEX IF NOT EXISTS idx_deals_listing_id ON deals (listing_id);
+CREATE INDEX IF NOT EXISTS idx_logs_deal_id_timestamp ON logs (deal_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs (timestamp);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys (expires_at);
+
+-- Full-text search over listings (SQLite FTS5), kept in sync by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+    description, payment_method, contact,
+    content='listings', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS listings_fts_ai AFTER INSERT ON listings BEGIN
+    INSERT INTO listings_fts(rowid, description, payment_method, contact)
+    VALUES (new.id, new.description, new.payment_method, new.contact);
+END;
+CREATE TRIGGER IF NOT EXISTS listings_fts_ad AFTER DELETE ON listings BEGIN
+    INSERT INTO listings_fts(listings_fts, rowid, description, payment_method, contact)
+    VALUES ('delete', old.id, old.description, old.payment_method, old.contact);
+END;
+CREATE TRIGGER IF NOT EXISTS listings_fts_au
+    AFTER UPDATE OF description, payment_method, contact ON listings BEGIN
+    INSERT INTO listings_fts(listings_fts, rowid, description, payment_method, contact)
+    VALUES ('delete', old.id, old.description, old.payment_method, old.contact);
+    INSERT INTO listings_fts(rowid, description, payment_method, contact)
+    VALUES (new.id, new.description, new.payment_method, new.contact);
+END;
 
 -- Insert default admin user
 INSERT OR IGNORE INTO users (id, name, telegram_username, telegram_id, type, verified) 
@@ -23,7 +23,31 @@ const DealPage = () => {
   const [copied, setCopied] = useState(false)
 
   useEffect(() => {
-    fetchDeal()
+    // Live updates: the stream sends the deal first, then each status change
+    const events = new EventSource(`http://localhost:8000/deals/${tradeCode}/events`)
+    const closeIfFinal = (status) => {
+      // Released and cancelled deals never change again; don't reconnect
+      if (status === 'released' || status === 'cancelled') events.close()
+    }
+
+    events.addEventListener('deal', (event) => {
+      const data = JSON.parse(event.data)
+      setDeal(data)
+      setError('')
+      setLoading(false)
+      closeIfFinal(data.status)
+    })
+    events.addEventListener('status', (event) => {
+      const { status } = JSON.parse(event.data)
+      setDeal((current) => current && { ...current, status })
+      closeIfFinal(status)
+    })
+    events.onerror = () => {
+      // The stream was refused (e.g. unknown deal): fall back to a one-off fetch
+      if (events.readyState === EventSource.CLOSED) fetchDeal()
+    }
+
+    return () => events.close()
   }, [tradeCode])
 
   const fetchDeal = async () => {
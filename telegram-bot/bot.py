@@ -188,6 +188,12 @@ For advanced options like payment methods and limits, use our website.
                     "trade_code": trade_code,
                     "user_id": user_id,
                     "notes": f"Payment confirmed via Telegram by user {user_id}"
+                },
+                # A resent command replays the first confirmation instead of repeating it;
+                # the user id lets the backend rate-limit per Telegram user, not per bot host
+                headers={
+                    "Idempotency-Key": f"confirm-payment:{trade_code}:{user_id}",
+                    "X-Telegram-User-Id": str(user_id),
                 }
             )
             
@@ -246,6 +252,12 @@ For advanced options like payment methods and limits, use our website.
                     "trade_code": trade_code,
                     "release_secret": RELEASE_SECRET,
                     "notes": f"Funds released via Telegram by admin {user_id}"
+                },
+                # A resent command replays the first release instead of answering
+                # "must be in 'paid' status"
+                headers={
+                    "Idempotency-Key": f"release-funds:{trade_code}:{user_id}",
+                    "X-Telegram-User-Id": str(user_id),
                 }
             )
             
@@ -395,17 +407,21 @@ Welcome, Administrator!
     async def show_platform_stats(self, query):
         """Show platform statistics for admin"""
         try:
-            # Fetch basic stats from API
-            listings_response = requests.get(f"{API_BASE_URL}/listings")
+            # Fetch counters from the stats endpoint (no listings download)
+            stats_response = requests.get(f"{API_BASE_URL}/stats")
             
-            if listings_response.status_code == 200:
-                listings_data = listings_response.json()
-                total_listings = listings_data.get('total', 0)
+            if stats_response.status_code == 200:
+                stats = stats_response.json().get('data', {})
+                listings = stats.get('active_listings', {})
+                deals = stats.get('deals', {})
                 
                 text = f"""
 📈 *Platform Statistics*
 
-📋 Total Active Listings: {total_listings}
+📋 Total Active Listings: {listings.get('total', 0)} ({listings.get('buy', 0)} buy / {listings.get('sell', 0)} sell)
+🤝 Open Deals: {deals.get('pending', 0) + deals.get('escrowed', 0)} · Awaiting Release: {deals.get('paid', 0)}
+📊 24h Volume: {stats.get('volume_24h', '0')} USDT
+💵 Commission Accrued: {stats.get('commission_accrued', '0')} USDT
 💰 Commission Rate: 1.5%
 ⏱️ Trade Timeout: 90 minutes
 